@@ -1,8 +1,17 @@
 import os
 import sys
-from datetime import datetime, timedelta
+import time
 
-from PySide6.QtWidgets import (
+# Referència per a --startup-time, abans d'importar Qt
+STARTED = time.perf_counter()
+
+from bisect import bisect_left, bisect_right  # noqa: E402
+from collections import OrderedDict  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+
+# Els diàlegs i ginys que no calen per a la primera finestra s'importen
+# quan es fan servir
+from PySide6.QtWidgets import (  # noqa: E402
     QApplication,
     QMainWindow,
     QHBoxLayout,
@@ -13,134 +22,620 @@ from PySide6.QtWidgets import (
     QLabel,
     QMessageBox,
     QDialog,
-    QDialogButtonBox,
-    QFormLayout,
     QLineEdit,
-    QCheckBox,
-    QDateEdit,
-    QInputDialog,
     QStyledItemDelegate,
-    QHeaderView,
+    QListWidget,
+    QListWidgetItem,
     QStyle,
     QStyleOptionViewItem
 )
-from PySide6.QtCore import Qt, Slot, QDate, QSize, QRect, QEvent
-from PySide6.QtSql import QSqlDatabase, QSqlTableModel, QSqlQuery
-from PySide6.QtGui import QIcon
+from PySide6.QtCore import (  # noqa: E402
+    Qt,
+    Slot,
+    QDate,
+    QSize,
+    QRect,
+    QEvent,
+    QAbstractTableModel,
+    QAbstractProxyModel,
+    QItemSelection,
+    QItemSelectionModel,
+    QModelIndex,
+    QObject,
+    QSettings,
+    QTimer,
+    Signal
+)
+from PySide6.QtGui import (  # noqa: E402
+    QIcon, QAction, QActionGroup, QKeySequence, QPainter, QPixmap)
+
+from instrument import recorder, trace_path  # noqa: E402
+from commands import (  # noqa: E402
+    AddModuleCommand, AddTaskCommand, DeleteModuleCommand, DeleteTasksCommand,
+    EditTaskCommand, RenameModuleCommand, SetFinishedCommand, UndoStack)
+from scheduler import DeadlineScheduler  # noqa: E402
+from worker import AsyncData  # noqa: E402
+
+# Una sola QIcon per fitxer en tot el procés: l'SVG es llig i es
+# rasteritza una vegada per mida i es comparteix entre tots els botons
+ICONS = {}
+
+
+def icon(name):
+    cached = ICONS.get(name)
+    if cached is None:
+        cached = ICONS[name] = QIcon(
+            os.path.join(os.path.dirname(__file__), "images", name))
+    return cached
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, startup_time=False):
         super().__init__()
+        self.startup_time = startup_time
+        self.painted = False
+        # None, "flushing" mentre es desa abans de tancar, "flushed" o
+        # "discard" quan ja es pot tancar
+        self.close_state = None
         self.setWindowTitle("Tasques per mòdul")
         layout = QHBoxLayout()
         widget = QWidget()
         widget.setLayout(layout)
         self.setCentralWidget(widget)
 
-        self.data = Data()
+        recorder.name_thread("interfície")
+        # Totes les consultes van al fil de dades; la finestra es mostra
+        # de seguida i les vistes indiquen què s'està carregant. Amb
+        # TASQUES_SERVER van al servei de sync.py, que comparteix els canvis
+        # amb les altres finestres.
+        self.data = AsyncData(
+            parent=self, server=os.environ.get("TASQUES_SERVER") or None)
+        self.data.open_failed.connect(self.on_open_failed)
+        self.data.opened.connect(self.reload_modules)
+        self.data.request_failed.connect(self.on_request_failed)
+        self.scheduler = DeadlineScheduler(self.data, self)
+        self.scheduler.notified.connect(self.on_deadline_notified)
+        self.undo_stack = UndoStack(self.data, parent=self)
 
-        self.module_model = QSqlTableModel(self)
-        self.module_model.setTable("module")
-        self.module_model.setEditStrategy(QSqlTableModel.OnFieldChange)
-        self.module_model.setHeaderData(1, Qt.Horizontal, "Name")
-        self.module_model.select()
+        self.module_model = ModuleModel(self.data, self)
+        self.module_model.undo_stack = self.undo_stack
 
         self.module_component = ViewComponent("Mòduls")
-        self.module_component.view.setModel(self.module_model)
+        self.module_component.setModel(self.module_model)
+        recorder.watch_model(self.module_model, "ModuleModel")
+        # Les columnes de comptadors no són dates ni CheckBox
+        self.module_component.view.setItemDelegate(
+            QStyledItemDelegate(self.module_component.view))
         self.module_component.view.hideColumn(0)
         self.module_component.view.setSelectionBehavior(
             QTableView.SelectionBehavior.SelectRows)
-        index = self.module_model.index(0, 1)
-        self.module_component.view.setCurrentIndex(index)
-        self.module_component.setMaximumWidth(250)
+        self.module_component.setMaximumWidth(400)
+        self.module_model.loading_changed.connect(
+            self.module_component.set_loading)
         selection_model = self.module_component.view.selectionModel()
         selection_model.selectionChanged.connect(self.on_selection_changed)
         self.module_component.add_button.clicked.connect(self.add_module)
         self.module_component.del_button.clicked.connect(self.del_module)
         layout.addWidget(self.module_component)
 
-        self.task_model = SQLTableModel(self)
-        self.task_model.setTable("task")
-        self.task_model.setEditStrategy(QSqlTableModel.OnFieldChange)
-        self.task_model.setHeaderData(2, Qt.Horizontal, "Descripció")
-        self.task_model.setHeaderData(3, Qt.Horizontal, "Data Finalització")
-        self.task_model.setHeaderData(4, Qt.Horizontal, "Fet")
-        id_module_selected = self.module_model.index(0, 0).data()
-        self.task_model.setFilter(f"module_id = {id_module_selected}")
-        self.task_model.select()
+        self.task_model = TaskModel(self.data, self)
+        self.task_model.undo_stack = self.undo_stack
+        # Abans que el filtre: la selecció es llig mentre encara hi és, i
+        # es torna a posar quan el filtre ja s'ha reiniciat
+        self.kept_selection = None
+        self.task_model.modelAboutToBeReset.connect(self.remember_selection)
+
+        self.task_filter = TaskFilterModel(self)
+        self.task_filter.setSourceModel(self.task_model)
+        self.task_model.modelReset.connect(self.restore_selection)
 
         self.tasks_component = ViewComponent("Tasques")
-        self.tasks_component.view.setModel(self.task_model)
+        self.tasks_component.setModel(
+            self.task_filter, key=lambda: self.task_model.module_id)
+        recorder.watch_model(self.task_model, "TaskModel")
+        recorder.watch_model(self.task_filter, "TaskFilterModel")
+        self.task_model.loading_changed.connect(
+            self.tasks_component.set_loading)
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filtra les tasques del mòdul...")
+        self.filter_box.setClearButtonEnabled(True)
+        self.tasks_component.layout().insertWidget(1, self.filter_box)
+        # S'espera que l'usuari pare d'escriure abans de filtrar
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(200)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_box.textChanged.connect(self.filter_timer.start)
         self.tasks_component.view.hideColumn(0)
         self.tasks_component.view.hideColumn(1)
+        self.tasks_component.view.setSelectionBehavior(
+            QTableView.SelectionBehavior.SelectRows)
+        self.tasks_component.view.setSelectionMode(
+            QTableView.SelectionMode.ExtendedSelection)
         self.tasks_component.add_button.clicked.connect(self.add_task)
-        self.tasks_component.del_button.clicked.connect(self.del_task)
+        self.tasks_component.del_button.clicked.connect(self.del_tasks)
         layout.addWidget(self.tasks_component)
 
+        # L'ordre el fa SQL (TaskModel.sort); la capçalera i el segon
+        # criteri es guarden entre sessions
+        self.settings = QSettings("Tasques", "Tasques per mòdul")
+        column = self.settings.value("tasks/sort_column", 3, type=int)
+        if column not in TaskModel.SORT_COLUMNS:
+            column = 3
+        descending = self.settings.value("tasks/sort_descending", False,
+                                         type=bool)
+        secondary = self.settings.value("tasks/secondary_sort", "deadline")
+        if secondary not in TaskModel.SECONDARY_SORTS:
+            secondary = TaskModel.SECONDARY_SORTS[0]
+        self.task_model.set_secondary(secondary)
+        header = self.tasks_component.view.horizontalHeader()
+        header.setSortIndicator(
+            column, Qt.DescendingOrder if descending else Qt.AscendingOrder)
+        self.tasks_component.view.setSortingEnabled(True)
+        header.sortIndicatorChanged.connect(self.on_sort_changed)
+
+        # Accions sobre totes les files seleccionades
+        self.del_tasks_action = QAction("Esborra les seleccionades", self)
+        self.del_tasks_action.setShortcut(QKeySequence.Delete)
+        self.del_tasks_action.triggered.connect(self.del_tasks)
+        self.done_action = QAction("Marca com a fetes", self)
+        self.done_action.triggered.connect(
+            lambda: self.set_tasks_finished(1))
+        self.undone_action = QAction("Marca com a no fetes", self)
+        self.undone_action.triggered.connect(
+            lambda: self.set_tasks_finished(0))
+        for action in (self.del_tasks_action, self.done_action,
+                       self.undone_action):
+            action.setShortcutContext(Qt.WidgetWithChildrenShortcut)
+            self.tasks_component.view.addAction(action)
+        self.tasks_component.view.setContextMenuPolicy(Qt.ActionsContextMenu)
+
+        self.flush_action = QAction(icon("floppy-disk-solid.svg"), "Desa ara",
+                                    self)
+        self.flush_action.setShortcut(QKeySequence.Save)
+        self.flush_action.setEnabled(False)
+        self.flush_action.triggered.connect(self.flush)
+        file_menu = self.menuBar().addMenu("Fitxer")
+        file_menu.addAction(self.flush_action)
+        file_menu.addSeparator()
+        file_menu.addAction("Importar tasques...", self.import_tasks)
+        file_menu.addAction("Exportar tasques...", self.export_tasks)
+        edit_menu = self.menuBar().addMenu("Edita")
+        undo_action = self.undo_stack.createUndoAction(self, "Desfés")
+        undo_action.setShortcut(QKeySequence.Undo)
+        redo_action = self.undo_stack.createRedoAction(self, "Refés")
+        redo_action.setShortcut(QKeySequence.Redo)
+        edit_menu.addAction(undo_action)
+        edit_menu.addAction(redo_action)
+        tasks_menu = self.menuBar().addMenu("Tasques")
+        tasks_menu.addAction(self.done_action)
+        tasks_menu.addAction(self.undone_action)
+        tasks_menu.addSeparator()
+        tasks_menu.addAction(self.del_tasks_action)
+        tasks_menu.addSeparator()
+        secondary_menu = tasks_menu.addMenu("Ordena després per")
+        secondary_group = QActionGroup(self)
+        for name, text in (("deadline", "Data Finalització"),
+                           ("description", "Descripció")):
+            action = secondary_menu.addAction(text)
+            action.setCheckable(True)
+            action.setChecked(name == secondary)
+            action.triggered.connect(
+                lambda _, name=name: self.set_secondary_sort(name))
+            secondary_group.addAction(action)
+        tools_menu = self.menuBar().addMenu("Eines")
+        self.trace_action = tools_menu.addAction("Instrumentació")
+        self.trace_action.setCheckable(True)
+        self.trace_action.setChecked(recorder.enabled)
+        self.trace_action.toggled.connect(recorder.enable)
+        tools_menu.addAction("Estadístiques...", self.show_stats)
+        tools_menu.addAction("Desa la traça...", self.save_trace)
+        self.stats_dialog = None
+
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Cerca tasques...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.returnPressed.connect(self.search)
+        self.addToolBar("Cerca").addWidget(self.search_box)
+        # La llista de resultats es crea amb la primera cerca
+        self.search_results = None
+
+        self.pending_label = QLabel()
+        self.statusBar().addPermanentWidget(self.pending_label)
+        self.data.pending_changed.connect(self.on_pending_changed)
+        self.data.flush_failed.connect(self.on_flush_failed)
+
+        self.module_component.set_loading(True)
+        if startup_time:
+            self.module_model.loading_changed.connect(self.check_startup)
+            self.task_model.loading_changed.connect(self.check_startup)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            if self.startup_time:
+                self.report_startup("Finestra pintada")
+            # Les dades es comencen a llegir després del primer pintat
+            QTimer.singleShot(0, self.data.start)
+
+    def report_startup(self, label):
+        elapsed = (time.perf_counter() - STARTED) * 1000
+        print(f"{label}: {elapsed:.0f} ms", file=sys.stderr)
+
+    @Slot()
+    def check_startup(self):
+        # Mòduls llegits i la primera pàgina del mòdul seleccionat a la vista
+        window = self.task_model.window
+        if self.module_model.rowCount() and not self.task_model.requests \
+                and self.task_model.module_id is not None and \
+                (window.pages or not window.total):
+            self.report_startup("Dades carregades")
+            self.startup_time = False
+            QTimer.singleShot(0, self.close)
+
+    def closeEvent(self, event):
+        # Primer es desa pel fil de dades sense bloquejar la finestra: amb
+        # la base de dades bloquejada, els reintents poden durar segons. La
+        # finestra es tanca quan ha acabat o quan es descarten els canvis.
+        if self.close_state is None and self.data.thread.isRunning():
+            self.close_state = "flushing"
+            self.data.call("flush", done=self.on_close_flushed,
+                           failed=self.on_close_flush_failed)
+        if self.close_state == "flushing":
+            event.ignore()
+            return
+        discard = self.close_state == "discard"
+        if not discard:
+            # Va a la cua abans del flush final de close(). Si es
+            # descarta, els lots caduquen sols (Data.TRASH_DAYS).
+            self.undo_stack.purge()
+        error = self.data.close(flush=not discard)
+        if error is None:
+            if trace_path and trace_path != "1":
+                recorder.save(trace_path)
+            event.accept()
+        else:
+            # Edicions fetes mentre es desava: es torna a començar
+            self.close_state = None
+            self.on_flush_failed(error)
+            event.ignore()
+
+    def on_close_flushed(self, _):
+        self.close_state = "flushed"
+        self.close()
+
+    def on_close_flush_failed(self, error):
+        answer = QMessageBox.warning(
+            self,
+            "Error desant els canvis",
+            f"{error}\n\nNo s'han pogut desar els canvis pendents. Es pot "
+            "tornar a provar o eixir sense desar-los.",
+            buttons=QMessageBox.Retry | QMessageBox.Discard |
+            QMessageBox.Cancel,
+            defaultButton=QMessageBox.Retry
+        )
+        if answer == QMessageBox.Retry:
+            self.data.call("flush", done=self.on_close_flushed,
+                           failed=self.on_close_flush_failed)
+        elif answer == QMessageBox.Discard:
+            self.close_state = "discard"
+            self.close()
+        else:
+            self.close_state = None
+
+    def flush(self):
+        self.data.call("flush", failed=self.on_flush_failed)
+
+    def show_stats(self):
+        if self.stats_dialog is None:
+            self.stats_dialog = StatsDialog(self)
+        self.stats_dialog.show()
+        self.stats_dialog.raise_()
+
+    def save_trace(self):
+        from PySide6.QtWidgets import QFileDialog
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Desa la traça", "tasques-trace.json", "Traça (*.json)")
+        if not path:
+            return
+        try:
+            recorder.save(path)
+        except OSError as error:
+            self.show_error("Error desant la traça", str(error))
+            return
+        self.statusBar().showMessage(f"Traça desada a {path}", 5000)
+
+    @Slot(str)
+    def on_open_failed(self, error):
+        QMessageBox.critical(
+            None,
+            "Error connectant a la base de dades!",
+            f"Database Error: {error}"
+        )
+        QApplication.exit(1)
+
+    @Slot(str)
+    def on_request_failed(self, error):
+        self.statusBar().showMessage(error, 5000)
+
+    @Slot(str)
+    def on_deadline_notified(self, message):
+        self.statusBar().showMessage(message, 15000)
+        QApplication.alert(self)
+
+    @Slot(int)
+    def on_pending_changed(self, count):
+        self.flush_action.setEnabled(count > 0)
+        if count:
+            self.pending_label.setText(f"Canvis pendents: {count}")
+        else:
+            self.pending_label.setText("")
+
+    @Slot(str)
+    def on_flush_failed(self, error):
+        QMessageBox.critical(
+            self,
+            "Error desant els canvis",
+            error,
+            buttons=QMessageBox.Ok,
+            defaultButton=QMessageBox.Ok
+        )
+
+    def show_error(self, title, error):
+        QMessageBox.critical(
+            self,
+            title,
+            error,
+            buttons=QMessageBox.Ok,
+            defaultButton=QMessageBox.Ok
+        )
+
     def add_task(self):
-        self.task_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
         task_dialog = TaskDialog()
         if task_dialog.exec():
-            self.data.connection.transaction()
             description = task_dialog.description.text()
-            deadline = task_dialog.date_time.dateTime().toString('dd/MM/yyyy')
-            # finished = task_dialog.finished.isChecked()
-            record = self.task_model.record()
-            # record.remove(record.indexOf("id"))
+            deadline = task_dialog.date_time.date().toString(Qt.ISODate)
             index = self.module_component.view.currentIndex()
-            id_module_selected = self.module_model.record(
-                index.row()).value("id")
-            record.setValue("module_id", id_module_selected)
-            record.setValue("description", description)
-            record.setValue("deadline", deadline)
-            record.setValue("finished", 0)
-
-            if self.task_model.insertRecord(-1, record):
-                if self.task_model.submitAll():
-                    self.task_model.database().commit()
-            else:
-                self.data.connection.rollback()
-                QMessageBox.critical(
-                    self,
-                    "Error insertant insertant nou mòdul",
-                    self.task_model.database().lastError().databaseText(),
-                    buttons=QMessageBox.Ok,
-                    defaultButton=QMessageBox.Ok
-                )
-        self.task_model.setEditStrategy(QSqlTableModel.OnFieldChange)
-
-    def del_task(self):
-        self.task_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        index = self.tasks_component.view.currentIndex()
-        if self.task_model.removeRow(index.row()):
-            self.task_model.submitAll()
-        self.task_model.setEditStrategy(QSqlTableModel.OnFieldChange)
+            id_module_selected = self.module_model.module_id(index.row())
+            self.undo_stack.push(AddTaskCommand(
+                self.data, id_module_selected, description, deadline,
+                failed=lambda error: self.show_error(
+                    "Error insertant nova tasca", error)))
+
+    def apply_filter(self):
+        self.task_filter.set_filter(self.filter_box.text())
+
+    @Slot(int, Qt.SortOrder)
+    def on_sort_changed(self, column, order):
+        self.settings.setValue("tasks/sort_column", column)
+        self.settings.setValue("tasks/sort_descending",
+                               order == Qt.DescendingOrder)
+
+    def set_secondary_sort(self, name):
+        self.settings.setValue("tasks/secondary_sort", name)
+        self.task_model.set_secondary(name)
+
+    @Slot()
+    def remember_selection(self):
+        # Ids de les files seleccionades que són en memòria i de la fila
+        # actual, per trobar-les en l'ordre nou
+        model = self.task_model
+        view = self.tasks_component.view
+        ranges = view.selectionModel().selection()
+        everything = len(ranges) == 1 and ranges[0].top() == 0 and \
+            ranges[0].bottom() == self.task_filter.rowCount() - 1
+        ids = []
+        if not everything:
+            for row in self.selected_rows():
+                values = model.cached_row(row)
+                if values is not None:
+                    ids.append(values[0])
+        current = self.task_filter.mapToSource(view.currentIndex())
+        values = model.cached_row(current.row()) if current.isValid() \
+            else None
+        self.kept_selection = (model.module_id, everything, ids,
+                               None if values is None else values[0])
+
+    @Slot()
+    def restore_selection(self):
+        kept, self.kept_selection = self.kept_selection, None
+        if kept is None or kept[0] != self.task_model.module_id:
+            return
+        _, everything, ids, current_id = kept
+        if everything:
+            self.tasks_component.view.selectAll()
+            return
+        wanted = ids if current_id is None or current_id in ids \
+            else ids + [current_id]
+        if wanted:
+            self.task_model.rows_of(
+                wanted, lambda rows: self.on_selection_located(
+                    ids, current_id, rows))
+
+    def on_selection_located(self, ids, current_id, rows):
+        view = self.tasks_component.view
+        selection_model = view.selectionModel()
+        if selection_model.hasSelection():
+            # L'usuari ja ha triat una altra cosa mentre es buscaven
+            return
+        # Amb el filtre actiu, les files que encara no ha mirat no hi són
+        proxy_rows = []
+        for task_id in ids:
+            if task_id in rows:
+                index = self.task_filter.mapFromSource(
+                    self.task_model.index(rows[task_id], 0))
+                if index.isValid():
+                    proxy_rows.append(index.row())
+        selection = QItemSelection()
+        last_column = self.task_filter.columnCount() - 1
+        proxy_rows.sort()
+        start = 0
+        for offset in range(1, len(proxy_rows) + 1):
+            if offset == len(proxy_rows) or \
+                    proxy_rows[offset] != proxy_rows[offset - 1] + 1:
+                selection.select(
+                    self.task_filter.index(proxy_rows[start], 0),
+                    self.task_filter.index(proxy_rows[offset - 1],
+                                           last_column))
+                start = offset
+        selection_model.select(selection,
+                               QItemSelectionModel.ClearAndSelect)
+        if current_id in rows:
+            index = self.task_filter.mapFromSource(
+                self.task_model.index(rows[current_id], 2))
+            if index.isValid():
+                selection_model.setCurrentIndex(
+                    index, QItemSelectionModel.NoUpdate)
+                view.scrollTo(index)
+
+    def selected_rows(self):
+        # Files del model de tasques que hi ha sota la selecció del filtre
+        rows = []
+        for selection_range in \
+                self.tasks_component.view.selectionModel().selection():
+            rows.extend(self.task_filter.source_rows(
+                selection_range.top(), selection_range.bottom()))
+        return sorted(set(rows))
+
+    def del_tasks(self):
+        rows = self.selected_rows()
+        if not rows:
+            return
+        if len(rows) > 1:
+            ok = QMessageBox.warning(
+                self,
+                "Esborrar tasques",
+                f"Estàs segur d'esborrar {len(rows)} tasques?",
+                buttons=QMessageBox.Ok | QMessageBox.Cancel,
+                defaultButton=QMessageBox.Cancel
+            )
+            if ok != QMessageBox.Ok:
+                return
+        self.task_model.task_ids(rows, lambda task_ids: self.undo_stack.push(
+            DeleteTasksCommand(
+                self.data, task_ids,
+                done=lambda deleted: self.statusBar().showMessage(
+                    f"{deleted} tasques esborrades", 5000),
+                failed=lambda error: self.show_error(
+                    "Error esborrant les tasques", error))))
+
+    def set_tasks_finished(self, finished):
+        rows = self.selected_rows()
+        if not rows:
+            return
+        self.task_model.task_ids(rows, lambda task_ids: self.undo_stack.push(
+            SetFinishedCommand(
+                self.data, task_ids, finished,
+                done=lambda updated: self.statusBar().showMessage(
+                    f"{updated} tasques actualitzades", 5000),
+                failed=lambda error: self.show_error(
+                    "Error actualitzant les tasques", error))))
+
+    def search(self):
+        self.data.call("search", self.search_box.text(),
+                       done=self.show_results)
+
+    def show_results(self, results):
+        if self.search_results is None:
+            self.search_results = QListWidget(self)
+            self.search_results.setWindowFlags(Qt.Popup)
+            self.search_results.itemActivated.connect(
+                self.on_result_activated)
+        self.search_results.clear()
+        if not results:
+            self.statusBar().showMessage("Cap tasca trobada", 5000)
+            return
+        for task_id, module_id, module, description, deadline in results:
+            date = QDate.fromString(deadline, Qt.ISODate).toString("dd/MM/yyyy")
+            item = QListWidgetItem(f"{module} · {description} ({date})")
+            item.setData(Qt.UserRole, (module_id, task_id))
+            self.search_results.addItem(item)
+        self.search_results.setCurrentRow(0)
+        self.search_results.resize(self.search_box.width(), 200)
+        self.search_results.move(self.search_box.mapToGlobal(
+            self.search_box.rect().bottomLeft()))
+        self.search_results.show()
+
+    @Slot(QListWidgetItem)
+    def on_result_activated(self, item):
+        self.search_results.hide()
+        module_id, task_id = item.data(Qt.UserRole)
+        self.show_task(module_id, task_id)
+
+    def show_task(self, module_id, task_id):
+        self.select_module(module_id)
+        self.task_model.row_of(task_id, self.on_task_located)
+
+    def on_task_located(self, row):
+        if row is None:
+            return
+        index = self.task_filter.mapFromSource(
+            self.task_model.index(row, 2))
+        if not index.isValid():
+            # La tasca està amagada pel filtre
+            self.filter_box.clear()
+            self.apply_filter()
+            index = self.task_filter.mapFromSource(
+                self.task_model.index(row, 2))
+        self.tasks_component.view.scrollTo(index)
+        self.tasks_component.view.setCurrentIndex(index)
+
+    def import_tasks(self):
+        from PySide6.QtWidgets import QFileDialog
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Importar tasques", "", "Tasques (*.csv *.json)")
+        if not path:
+            return
+        self.statusBar().showMessage("Important tasques...")
+        self.data.call("import_tasks", path, done=self.on_imported,
+                       failed=self.on_import_failed)
+
+    def on_imported(self, imported):
+        self.reload_modules()
+        self.statusBar().showMessage(f"{imported} tasques importades", 5000)
+
+    def on_import_failed(self, error):
+        self.statusBar().clearMessage()
+        self.show_error("Error important tasques", error)
+
+    def export_tasks(self):
+        from PySide6.QtWidgets import QFileDialog
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Exportar tasques", "tasques.csv", "Tasques (*.csv *.json)")
+        if not path:
+            return
+        self.data.call(
+            "export_tasks", path,
+            done=lambda exported: self.statusBar().showMessage(
+                f"{exported} tasques exportades", 5000),
+            failed=lambda error: self.show_error(
+                "Error exportant tasques", error))
+
+    def reload_modules(self, module_id=None):
+        # Torna a llegir els mòduls mantenint el mòdul seleccionat
+        if module_id is None:
+            module_id = self.task_model.module_id
+        self.module_model.load(lambda: self.select_module(module_id))
+
+    def select_module(self, module_id):
+        row = self.module_model.row_of(module_id)
+        if row is None:
+            if not self.module_model.rowCount():
+                return
+            row = 0
+        index = self.module_model.index(row, 1)
+        self.module_component.view.setCurrentIndex(index)
 
     def add_module(self):
-        self.module_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+        from PySide6.QtWidgets import QInputDialog
         name, ok = QInputDialog.getText(self, "Nou mòdul", "Nom del mòdul")
         if (ok):
-            self.data.connection.transaction()
-            record = self.module_model.record()
-            record.setValue("name", name)
-            if self.module_model.insertRecord(-1, record):
-                if self.module_model.submitAll():
-                    self.module_model.database().commit()
-                    index = self.module_model.index(
-                        self.module_model.rowCount() - 1, 1)
-                    self.module_component.view.setCurrentIndex(index)
-            else:
-                self.data.connection.rollback()
-                QMessageBox.critical(
-                    self,
+            self.undo_stack.push(AddModuleCommand(
+                self.data, name, done=self.select_module,
+                failed=lambda error: self.show_error(
                     "Error insertant insertant nou mòdul",
-                    "Error insertant insertant nou mòdul" +
-                    self.module_model.database().lastError().databaseText(),
-                    buttons=QMessageBox.Ok,
-                    defaultButton=QMessageBox.Ok
-                )
-        self.module_model.setEditStrategy(QSqlTableModel.OnFieldChange)
+                    "Error insertant insertant nou mòdul" + error)))
 
     def del_module(self):
         ok = QMessageBox.warning(
@@ -150,21 +645,26 @@ class MainWindow(QMainWindow):
             buttons=QMessageBox.Ok | QMessageBox.Cancel,
             defaultButton=QMessageBox.Cancel
         )
-        if ok:
-            self.module_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+        if ok == QMessageBox.Ok:
             index = self.module_component.view.currentIndex()
-            if self.module_model.removeRow(index.row()):
-                self.module_model.submitAll()
-                self.module_model.database().commit()
-            self.module_model.setEditStrategy(QSqlTableModel.OnFieldChange)
-            index = self.module_model.index(0, 1)
-            self.module_component.view.setCurrentIndex(index)
+            id_module_selected = self.module_model.module_id(index.row())
+            self.undo_stack.push(DeleteModuleCommand(
+                self.data, id_module_selected,
+                self.module_model.index(index.row(), 1).data(),
+                done=lambda _: self.select_module(self.task_model.module_id),
+                failed=lambda error: self.show_error(
+                    "Error esborrant el mòdul", error)))
 
     @Slot()
     def on_selection_changed(self, selected):
         indexes = selected.indexes()
-        id_module_selected = indexes[0].data()
-        self.task_model.setFilter(f"module_id = {id_module_selected}")
+        if not indexes:
+            return
+        id_module_selected = self.module_model.module_id(indexes[0].row())
+        # Les edicions del mòdul que es deixa es desen ara, encara que el
+        # nou vinga de la memòria cau i no es torne a comptar
+        self.flush()
+        self.task_model.set_module(id_module_selected)
 
 
 class ViewComponent(QWidget):
@@ -173,19 +673,24 @@ class ViewComponent(QWidget):
         main_layout = QVBoxLayout()
 
         self.setLayout(main_layout)
-        self.view = QTableView()
+        self.view = TableView()
+        self.view.setObjectName(title)
         self.view.setItemDelegate(StyledItemDelegate(self.view))
         self.view.verticalHeader().setVisible(False)
         self.view.horizontalHeader().setStretchLastSection(True)
-        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        main_layout.addWidget(QLabel(title))
+        self.sizer = ColumnSizer(self.view)
+        title_layout = QHBoxLayout()
+        title_layout.addWidget(QLabel(title))
+        title_layout.addStretch()
+        self.loading_label = QLabel("Carregant...")
+        self.loading_label.setVisible(False)
+        title_layout.addWidget(self.loading_label)
+        main_layout.addLayout(title_layout)
         main_layout.addWidget(self.view)
 
         buttons = QHBoxLayout()
-        icon_path = os.path.join(os.path.dirname(__file__), "images/add.svg")
-        self.add_button = QPushButton(icon=QIcon(icon_path))
-        icon_path = os.path.join(os.path.dirname(__file__), "images/del.svg")
-        self.del_button = QPushButton(icon=QIcon(icon_path))
+        self.add_button = QPushButton(icon=icon("add.svg"))
+        self.del_button = QPushButton(icon=icon("del.svg"))
         # icon_path = os.path.join(os.path.dirname(__file__), "images/edit.svg")
         # self.edit_button = QPushButton(icon=QIcon(icon_path))
         buttons.addWidget(self.add_button)
@@ -193,9 +698,163 @@ class ViewComponent(QWidget):
         # buttons.addWidget(self.edit_button)
         main_layout.addLayout(buttons)
 
+    def setModel(self, model, key=None):
+        self.view.setModel(model)
+        self.sizer.attach(model, key)
+
+    @Slot(bool)
+    def set_loading(self, loading):
+        self.loading_label.setVisible(loading)
+
+
+class TableView(QTableView):
+    # QTableView que apunta el temps de cada pintat si hi ha instrumentació
+    def paintEvent(self, event):
+        if not recorder.enabled:
+            return super().paintEvent(event)
+        start = time.perf_counter_ns()
+        super().paintEvent(event)
+        recorder.span("paint", self.objectName(), start)
+
+
+class StatsDialog(QDialog):
+    # Resum en viu de la instrumentació, ordenat pel temps total
+    HEADERS = ["Categoria", "Nom", "Vegades", "Total (ms)", "Mitjana (ms)",
+               "Màxim (ms)"]
+
+    def __init__(self, parent=None):
+        from PySide6.QtWidgets import QDialogButtonBox, QTableWidget
+        super().__init__(parent)
+        self.setWindowTitle("Estadístiques de rendiment")
+        self.resize(800, 400)
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(self.table.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table)
+        buttons = QDialogButtonBox(QDialogButtonBox.Reset |
+                                   QDialogButtonBox.Close)
+        buttons.button(QDialogButtonBox.Reset).setText("Buida")
+        buttons.button(QDialogButtonBox.Reset).clicked.connect(self.clear)
+        buttons.rejected.connect(self.close)
+        layout.addWidget(buttons)
+        self.timer = QTimer(self)
+        self.timer.setInterval(500)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def clear(self):
+        recorder.clear()
+        self.refresh()
+
+    def refresh(self):
+        from PySide6.QtWidgets import QTableWidgetItem
+        rows = recorder.summary()
+        self.table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                if isinstance(value, float):
+                    text = f"{value:.3f}"
+                else:
+                    text = str(value)
+                item = self.table.item(row, column)
+                if item is None:
+                    item = QTableWidgetItem()
+                    if column >= 2:
+                        item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                    self.table.setItem(row, column, item)
+                item.setText(text)
+
+
+class ColumnSizer(QObject):
+    # Substitueix ResizeToContents, que torna a mesurar totes les files a
+    # cada canvi. Les amplades es calculen amb una mostra de files, es
+    # guarden per clau (el mòdul a la vista de tasques) i només creixen
+    # quan una cel·la nova o editada no hi cap.
+    SAMPLE_ROWS = 100
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self.key = lambda: None
+        self.widths = {}
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.measure)
+
+    def attach(self, model, key=None):
+        if key is not None:
+            self.key = key
+        model.modelReset.connect(self.timer.start)
+        model.rowsInserted.connect(self.on_rows_inserted)
+        model.dataChanged.connect(self.on_data_changed)
+        self.timer.start()
+
+    def columns(self):
+        columns = [column for column in range(self.view.model().columnCount())
+                   if not self.view.isColumnHidden(column)]
+        if self.view.horizontalHeader().stretchLastSection():
+            # L'última columna ocupa l'espai que sobra
+            columns = columns[:-1]
+        return columns
+
+    def measure(self):
+        key = self.key()
+        if key not in self.widths:
+            rows = range(min(self.view.model().rowCount(), self.SAMPLE_ROWS))
+            self.widths[key] = {column: self._width(column, rows)
+                                for column in self.columns()}
+        header = self.view.horizontalHeader()
+        for column, width in self.widths[key].items():
+            if header.sectionSize(column) != width:
+                header.resizeSection(column, width)
+
+    def grow(self, rows):
+        if self.timer.isActive():
+            return
+        widths = self.widths.setdefault(self.key(), {})
+        header = self.view.horizontalHeader()
+        for column in self.columns():
+            width = self._width(column, rows)
+            if width > widths.get(column, 0):
+                widths[column] = width
+                header.resizeSection(column, width)
+
+    def _width(self, column, rows):
+        model = self.view.model()
+        grid = 1 if self.view.showGrid() else 0
+        width = self.view.horizontalHeader().sectionSizeHint(column)
+        for row in rows:
+            hint = self.view.sizeHintForIndex(model.index(row, column))
+            width = max(width, hint.width() + grid)
+        return width
+
+    @Slot(QModelIndex, int, int)
+    def on_rows_inserted(self, parent, first, last):
+        if first < self.SAMPLE_ROWS:
+            self.grow(range(first, min(last + 1, self.SAMPLE_ROWS)))
+
+    @Slot(QModelIndex, QModelIndex, "QList<int>")
+    def on_data_changed(self, top_left, bottom_right, roles=[]):
+        last = min(bottom_right.row(), top_left.row() + self.SAMPLE_ROWS - 1)
+        self.grow(range(top_left.row(), last + 1))
+
 
 class TaskDialog(QDialog):
     def __init__(self, parent=None):
+        from PySide6.QtWidgets import QDateEdit, QDialogButtonBox, QFormLayout
         super().__init__(parent)
 
         self.setWindowTitle("Tasca")
@@ -218,107 +877,11 @@ class TaskDialog(QDialog):
         form_layout.addWidget(button_box)
 
 
-class Data():
-    def __init__(self) -> None:
-        self.connection = QSqlDatabase.addDatabase("QSQLITE")
-        path = os.path.join(os.path.dirname(__file__),
-                            "data.sqlite")
-        self.connection.setDatabaseName(path)
-
-        if not self.connection.open():
-            QMessageBox.critical(
-                None,
-                "Error connectant a la base de dades!",
-                f"Database Error: {self.connection.lastError().databaseText()}"
-            )
-            sys.exit(1)
-        else:
-            self.connection.exec("PRAGMA foreign_keys = 1")
-
-        if os.path.getsize(path) == 0:
-            createTablesQuery = QSqlQuery()
-            module_table_created = createTablesQuery.exec(
-                """
-                CREATE TABLE IF NOT EXISTS module (
-                id INTEGER PRIMARY KEY ASC,
-                name TEXT NOT NULL UNIQUE);
-                """
-            )
-            task_table_created = createTablesQuery.exec(
-                """
-                CREATE TABLE IF NOT EXISTS task (
-                id INTEGER PRIMARY KEY ASC,
-                module_id integer NOT NULL,
-                description TEXT NOT NULL,
-                deadline TEXT NOT NULL,
-                finished INTEGER NOT NULL,
-                CONSTRAINT fk_module
-                    FOREIGN KEY (module_id)
-                    REFERENCES module (id)
-                    ON DELETE CASCADE);
-                """
-            )
-            if not (module_table_created and task_table_created):
-                QMessageBox.critical(
-                    None,
-                    "Error connectant a la base de dades!",
-                    f"Database Error: {self.connection.lastError().databaseText()}"
-                )
-                sys.exit(1)
-
-            insertModulesQuery = QSqlQuery()
-            # Estil OBDC
-            prepared = insertModulesQuery.prepare(
-                """
-                INSERT INTO module (
-                    name
-                )
-                VALUES (?)
-                """
-            )
-
-            if prepared:
-                data = ["DI", "AD", "PMDM", "PSP", "SGE",
-                        "EIE", "ANG-II", "PROJECTE", "FCT"]
-                # Inserció amb addBindValue
-                for name in data:
-                    insertModulesQuery.addBindValue(name)
-                    insertModulesQuery.exec()
-
-            insertModulesQuery = QSqlQuery()
-            # Estil OBDC
-            prepared = insertModulesQuery.prepare(
-                """
-                INSERT INTO task (
-                    module_id,
-                    description,
-                    deadline,
-                    finished
-                )
-                VALUES (?, ?, ?, ?)
-                """
-            )
-
-            if prepared:
-                data = [
-                    ("1", "Tasca de prova 1", "23/01/2023", 0),
-                    ("1", "Tasca de prova 2", "23/01/2023", 1),
-                    ("2", "Tasca de prova 3", "23/01/2023", 1)
-                ]
-                # Inserció amb addBindValue
-                for module_id, description, deadline, finished in data:
-                    insertModulesQuery.addBindValue(module_id)
-                    insertModulesQuery.addBindValue(description)
-                    insertModulesQuery.addBindValue(deadline)
-                    insertModulesQuery.addBindValue(finished)
-                    insertModulesQuery.exec()
-
-
 class StyledItemDelegate(QStyledItemDelegate):
     def createEditor(self, parent, option, index):
         if index.column() == 3:
-            day, month, year = index.data().split("/")
-            date = QDate(int(year), int(month), int(day))
+            from PySide6.QtWidgets import QDateEdit
+            date = QDate.fromString(index.data(Qt.EditRole), Qt.ISODate)
             editor = QDateEdit(date, parent)
             editor.setDisplayFormat("dd/MM/yyyy")
         elif index.column() == 4:
@@ -332,20 +895,84 @@ class StyledItemDelegate(QStyledItemDelegate):
     def setModelData(self, editor, model, index):
         if index.column() == 3:
             date = editor.date()
-            model.setData(index, date.toString("dd/MM/yyyy"), Qt.DisplayRole)
+            model.setData(index, date.toString(Qt.ISODate), Qt.DisplayRole)
         else:
             QStyledItemDelegate.setModelData(self, editor, model, index)
 
-    def paint(self, painter, option, index):
-        if index.column() == 4:  # centrar el CheckBox
-            viewItemOption = QStyleOptionViewItem(option)
+    # Geometria i imatges del CheckBox compartides per totes les vistes:
+    # pintar una cel·la de la columna 4 no crea cap objecte nou. Cada
+    # amplada de columna és una clau nova: en passar del límit es buiden.
+    check_geometry = {}
+    check_pixmaps = {}
+    CHECK_CACHE_SIZE = 64
+
+    def _check_geometry(self, option, index):
+        # Rectangles centrat i de l'indicador, relatius a la cel·la
+        key = (option.rect.width(), option.rect.height(),
+               option.decorationSize.width(), option.decorationSize.height(),
+               option.direction)
+        geometry = self.check_geometry.get(key)
+        if geometry is None:
             center = QStyle.alignedRect(option.direction, Qt.AlignCenter,
                                         QSize(option.decorationSize.width() +
                                               5, option.decorationSize.height()),
-                                        QRect(option.rect.x(), option.rect.y(),
-                                              option.rect.width(), option.rect.height()))
+                                        QRect(0, 0, option.rect.width(),
+                                              option.rect.height()))
+            viewItemOption = QStyleOptionViewItem(option)
+            self.initStyleOption(viewItemOption, index)
             viewItemOption.rect = center
-            super().paint(painter, viewItemOption, index)
+            style = option.widget.style() if option.widget else QApplication.style()
+            indicator = style.subElementRect(
+                QStyle.SE_ItemViewItemCheckIndicator, viewItemOption,
+                option.widget)
+            geometry = (center, indicator)
+            if len(self.check_geometry) >= self.CHECK_CACHE_SIZE:
+                self.check_geometry.clear()
+            self.check_geometry[key] = geometry
+        return geometry
+
+    def _check_pixmap(self, checked, option, indicator, ratio):
+        enabled = bool(option.state & QStyle.State_Enabled)
+        style = option.widget.style() if option.widget else QApplication.style()
+        key = (checked, enabled, indicator.width(), indicator.height(),
+               ratio, style.name())
+        pixmap = self.check_pixmaps.get(key)
+        if pixmap is None:
+            pixmap = QPixmap(indicator.size() * ratio)
+            pixmap.setDevicePixelRatio(ratio)
+            pixmap.fill(Qt.transparent)
+            checkOption = QStyleOptionViewItem()
+            checkOption.rect = QRect(0, 0, indicator.width(),
+                                     indicator.height())
+            checkOption.palette = option.palette
+            checkOption.state = QStyle.State_On if checked else QStyle.State_Off
+            if enabled:
+                checkOption.state |= QStyle.State_Enabled
+            pixmap_painter = QPainter(pixmap)
+            style.drawPrimitive(QStyle.PE_IndicatorItemViewItemCheck,
+                                checkOption, pixmap_painter, option.widget)
+            pixmap_painter.end()
+            if len(self.check_pixmaps) >= self.CHECK_CACHE_SIZE:
+                self.check_pixmaps.clear()
+            self.check_pixmaps[key] = pixmap
+        return pixmap
+
+    def paint(self, painter, option, index):
+        state = index.data(Qt.CheckStateRole) if index.column() == 4 else None
+        # Sense estat la fila encara s'està carregant
+        if state is not None:  # centrar el CheckBox
+            center, indicator = self._check_geometry(option, index)
+            rect = option.rect
+            # El fons (selecció, hover, files alternes) i el focus de teclat
+            # els pinta l'estil, amb l'opció sense text ni indicador; de la
+            # memòria cau només ve l'indicador
+            style = option.widget.style() if option.widget else QApplication.style()
+            style.drawControl(QStyle.CE_ItemViewItem, option, painter,
+                              option.widget)
+            checked = state == Qt.Checked
+            painter.drawPixmap(rect.x() + indicator.x(), rect.y() + indicator.y(),
+                               self._check_pixmap(checked, option, indicator,
+                                                  painter.device().devicePixelRatio()))
         else:
             super().paint(painter, option, index)
 
@@ -356,16 +983,14 @@ class StyledItemDelegate(QStyledItemDelegate):
                 return False
 
             value = index.data(Qt.CheckStateRole)
-            # if not value.isValid():
-            #     return False
+            if value is None:
+                return False
 
             if event.type() == QEvent.MouseButtonRelease:
-                check_rect = QStyle.alignedRect(option.direction, Qt.AlignCenter,
-                                                QSize(option.decorationSize.width() +
-                                                      5, option.decorationSize.height()),
-                                                QRect(option.rect.x(), option.rect.y(),
-                                                      option.rect.width(), option.rect.height()))
-                if not check_rect.contains(event.pos()):
+                check_rect, _ = self._check_geometry(option, index)
+                position = event.pos()
+                if not check_rect.contains(position.x() - option.rect.x(),
+                                           position.y() - option.rect.y()):
                     return False
             elif event.type() == QEvent.KeyPress:
                 if event.key() != Qt.Key_Space and event.key() != Qt.Key_Select:
@@ -373,7 +998,7 @@ class StyledItemDelegate(QStyledItemDelegate):
             else:
                 return False
 
-            if value == Qt.Checked.value:
+            if value == Qt.Checked:
                 state = Qt.Unchecked
             else:
                 state = Qt.Checked
@@ -382,43 +1007,1141 @@ class StyledItemDelegate(QStyledItemDelegate):
         return super().editorEvent(event, model, option, index)
 
 
-class SQLTableModel(QSqlTableModel):
-    def __init__(self, parent):
+class ModuleModel(QAbstractTableModel):
+    # Mòduls (id, nom) amb tres columnes calculades: fetes, total i
+    # endarrerides. Els mòduls es llegeixen al fil de dades i els
+    # comptadors de la còpia en memòria d'AsyncData, així que pintar-los
+    # no fa cap consulta.
+    COLUMNS = ["id", "name"]
+    HEADERS = {1: "Name"}
+    COUNTERS = {2: ("Fetes", 1), 3: ("Total", 0), 4: ("Endarrerides", 2)}
+
+    loading_changed = Signal(bool)
+
+    def __init__(self, data, parent=None):
         super().__init__(parent)
+        self.db = data
+        self.modules = []
+        self.rows = {}
+        # Si hi és, els canvis de nom passen per la pila de desfer
+        self.undo_stack = None
+        self.db.counters_changed.connect(self.on_counters_changed)
+        self.db.module_added.connect(self.on_module_added)
+        self.db.module_removed.connect(self.on_module_removed)
+
+    def load(self, done=None):
+        self.loading_changed.emit(True)
+        self.db.call("modules",
+                     done=lambda modules: self.on_loaded(modules, done),
+                     failed=self.on_load_failed)
+
+    def on_loaded(self, modules, done):
+        self.beginResetModel()
+        self.modules = [list(module) for module in modules]
+        self.rows = {module[0]: row for row, module in enumerate(modules)}
+        self.endResetModel()
+        self.loading_changed.emit(False)
+        if done is not None:
+            done()
+
+    def on_load_failed(self, error):
+        self.loading_changed.emit(False)
+        self.db.report(error)
+
+    def module_id(self, row):
+        if 0 <= row < len(self.modules):
+            return self.modules[row][0]
+        return None
+
+    def row_of(self, module_id):
+        return self.rows.get(module_id)
+
+    @Slot(int, str)
+    def on_module_added(self, module_id, name):
+        # Els mòduls van per id: un de nou va al final i un de recuperat
+        # de la paperera, al seu lloc
+        if module_id in self.rows:
+            return
+        row = bisect_left([module[0] for module in self.modules], module_id)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.modules.insert(row, [module_id, name])
+        self.rows = {module[0]: row for row, module in enumerate(self.modules)}
+        self.endInsertRows()
+
+    @Slot(int)
+    def on_module_removed(self, module_id):
+        row = self.rows.get(module_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.modules[row]
+        self.rows = {module[0]: row for row, module in enumerate(self.modules)}
+        self.endRemoveRows()
+
+    @Slot(int)
+    def on_counters_changed(self, module_id):
+        row = self.rows.get(module_id)
+        if row is not None:
+            self.dataChanged.emit(self.index(row, 2), self.index(row, 4))
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.modules)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS) + len(self.COUNTERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        module = self.modules[index.row()]
+        counter = self.COUNTERS.get(index.column())
+        if counter is None:
+            if role in (Qt.DisplayRole, Qt.EditRole):
+                return module[index.column()]
+            return None
+        if role == Qt.DisplayRole:
+            return self.db.module_counters(module[0])[counter[1]]
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if index.column() != 1 or role != Qt.EditRole:
+            return False
+        module_id, old_name = self.modules[index.row()]
+        if value == old_name:
+            return True
+        if self.undo_stack is not None:
+            self.undo_stack.push(RenameModuleCommand(self, module_id,
+                                                     old_name, value))
+        else:
+            self.rename(module_id, value)
+        return True
+
+    def rename(self, module_id, name):
+        row = self.rows.get(module_id)
+        if row is None:
+            return
+        module = self.modules[row]
+        old_name = module[1]
+        module[1] = name
+        index = self.index(row, 1)
+        self.dataChanged.emit(index, index)
+        self.db.call("rename_module", module_id, name,
+                     failed=lambda error: self.on_rename_failed(
+                         module, old_name, error))
+
+    def on_rename_failed(self, module, old_name, error):
+        module[1] = old_name
+        row = self.rows.get(module[0])
+        if row is not None:
+            index = self.index(row, 1)
+            self.dataChanged.emit(index, index)
+        self.db.report(error)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            counter = self.COUNTERS.get(section)
+            if counter is not None:
+                return counter[0]
+            return self.HEADERS.get(section, self.COLUMNS[section])
+        return super().headerData(section, orientation, role)
 
     def flags(self, index):
-        if index.column() == 4:
-            return super().flags(index) | Qt.ItemIsUserCheckable
+        flags = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+        if index.column() == 1:
+            return flags | Qt.ItemIsEditable
+        return flags
+
+
+def task_row(task_id, module_id, description, deadline, finished):
+    # Fila tal com la serveix TaskModel.data(): les cinc columnes de la
+    # taula més la data en format local i l'estat del CheckBox ja calculats
+    return (task_id, module_id, description, deadline, finished,
+            f"{deadline[8:10]}/{deadline[5:7]}/{deadline[0:4]}",
+            Qt.Checked if finished else Qt.Unchecked)
+
+
+class TaskWindow():
+    # Estat de lectura d'un mòdul: files recorregudes, claus d'inici de
+    # cada pàgina i les pàgines carregades (LRU)
+    def __init__(self, key=(3, 0), total=0):
+        # Camps de task_row() que formen la clau de l'ordre, amb l'id
+        self.key = key
+        self.total = total
+        # Les insercions i esborrats abans del recompte ja hi van inclosos
+        self.counted = False
+        self.fetched = 0
+        # anchors[n] és la clau de l'última fila abans de la pàgina n
+        self.anchors = {0: None}
+        self.pages = OrderedDict()
+        # Pàgines demanades al fil de dades que encara no han arribat
+        self.loading = set()
+        # Canvia amb cada inserció o esborrat: les pàgines demanades abans
+        # arriben desplaçades i es descarten
+        self.generation = 0
+        # Última pàgina llegida, per a no tocar l'LRU a cada data()
+        self.last_number = None
+        self.last_rows = None
+
+    def size(self):
+        return sum(len(rows) for rows in self.pages.values())
+
+    def key_of(self, row):
+        return tuple(row[field] for field in self.key)
+
+    def positions(self, task_ids, page_size):
+        # Posicions de les tasques que són a les pàgines en memòria
+        task_ids = set(task_ids)
+        return [number * page_size + offset
+                for number, rows in self.pages.items()
+                for offset, row in enumerate(rows) if row[0] in task_ids]
+
+    def find(self, task_id):
+        for number, rows in self.pages.items():
+            for offset, row in enumerate(rows):
+                if row[0] == task_id:
+                    return number, offset
+        return None
+
+    def patch(self, task_id, column, value):
+        position = self.find(task_id)
+        if position is not None:
+            number, offset = position
+            rows = self.pages[number]
+            values = list(rows[offset][:5])
+            values[column] = value
+            rows[offset] = task_row(*values)
+        return position
+
+    def patch_many(self, task_ids, column, value):
+        # Un sol recorregut de les pàgines per a tot el conjunt
+        task_ids = set(task_ids)
+        positions = []
+        for number, rows in self.pages.items():
+            for offset, row in enumerate(rows):
+                if row[0] in task_ids:
+                    values = list(row[:5])
+                    values[column] = value
+                    rows[offset] = task_row(*values)
+                    positions.append((number, offset))
+        return positions
+
+    def insert(self, position, row, page_size):
+        # Desplaça una fila cap avall les pàgines en memòria des de la
+        # inserció. La pàgina següent a una que no és en memòria no sap
+        # quina fila li entra pel principi i es descarta.
+        self.total += 1
+        self.generation += 1
+        self.last_number = None
+        self.last_rows = None
+        number, offset = divmod(position, page_size)
+        carry = None
+        previous = None
+        for page in sorted(page for page in self.pages if page >= number):
+            rows = self.pages[page]
+            if page == number:
+                rows.insert(offset, row)
+            elif previous == page - 1 and carry is not None:
+                rows.insert(0, carry)
+            else:
+                del self.pages[page]
+                previous = None
+                continue
+            carry = rows.pop() if len(rows) > page_size else None
+            previous = page
+        self._update_anchors(number, page_size)
+
+    def remove(self, position, page_size):
+        # Desplaça una fila cap amunt les pàgines des de l'esborrat; cada
+        # pàgina pren la primera fila de la següent
+        total = self.total
+        self.total -= 1
+        self.generation += 1
+        self.last_number = None
+        self.last_rows = None
+        number, offset = divmod(position, page_size)
+        for page in sorted(page for page in self.pages if page >= number):
+            rows = self.pages[page]
+            if page == number:
+                del rows[offset:offset + 1]
+            else:
+                del rows[:1]
+            following = self.pages.get(page + 1)
+            if following:
+                rows.append(following[0])
+            elif (page + 1) * page_size < total:
+                # Hi ha més files però no se sap quina entra
+                del self.pages[page]
+        self._update_anchors(number, page_size)
+
+    def _update_anchors(self, number, page_size):
+        for page in [page for page in self.anchors if page > number]:
+            rows = self.pages.get(page - 1)
+            if rows is not None and len(rows) == page_size:
+                self.anchors[page] = self.key_of(rows[-1])
+            else:
+                del self.anchors[page]
+
+
+class TaskCache():
+    # LRU de finestres per mòdul. Tornar a un mòdul recent no fa cap
+    # consulta; el pressupost es compta en files guardades.
+    def __init__(self, max_rows=20000):
+        self.max_rows = max_rows
+        self.windows = OrderedDict()
+
+    def take(self, module_id):
+        return self.windows.pop(module_id, None)
+
+    def put(self, module_id, window):
+        if module_id is None:
+            return
+        self.windows[module_id] = window
+        self.windows.move_to_end(module_id)
+        used = sum(window.size() for window in self.windows.values())
+        while used > self.max_rows and self.windows:
+            _, evicted = self.windows.popitem(last=False)
+            used -= evicted.size()
+
+    def invalidate(self, module_id):
+        self.windows.pop(module_id, None)
+
+    def update(self, module_id, task_id, column, value):
+        window = self.windows.get(module_id)
+        if window is None:
+            return
+        if column in window.key:
+            # Una columna de l'ordre canvia l'ordre i les claus de pàgina
+            self.invalidate(module_id)
+            return
+        window.patch(task_id, column, value)
+
+    def update_many(self, module_id, task_ids, column, value):
+        window = self.windows.get(module_id)
+        if window is None:
+            return
+        if column in window.key:
+            self.invalidate(module_id)
+            return
+        window.patch_many(task_ids, column, value)
+
+    def insert(self, module_id, position, row, page_size):
+        window = self.windows.get(module_id)
+        if window is not None and window.counted:
+            window.insert(position, row, page_size)
+
+    def remove(self, module_id, positions, page_size):
+        window = self.windows.get(module_id)
+        if window is not None and window.counted:
+            for position in positions:
+                window.remove(position, page_size)
+
+
+class TaskModel(QAbstractTableModel):
+    # Model virtualitzat de les tasques d'un mòdul. Les files es llegeixen
+    # per pàgines amb paginació per clau (les columnes de l'ordre i l'id) i
+    # només es mantenen en memòria les últimes MAX_PAGES pàgines
+    # consultades.
+    COLUMNS = ["id", "module_id", "description", "deadline", "finished"]
+    HEADERS = {2: "Descripció", 3: "Data Finalització", 4: "Fet"}
+    PAGE_SIZE = 256
+    MAX_PAGES = 8
+    # Ordre que fa SQL amb un índex per combinació: la columna de la
+    # capçalera i un segon criteri per als empats. Amb qualsevol altre que
+    # no siga el de Data, les insercions i els esborrats no porten la
+    # posició i el model es torna a llegir.
+    SORT_COLUMNS = {2: "description", 3: "deadline", 4: "finished"}
+    SECONDARY_SORTS = ["deadline", "description"]
+    DEFAULT_ORDER = ["deadline"]
+    # La data es guarda en ISO-8601 però es mostra en format local
+    ROLE_FIELDS = {
+        Qt.DisplayRole: (0, 1, 2, 5, None),
+        Qt.EditRole: (0, 1, 2, 3, None),
+        Qt.CheckStateRole: (None, None, None, None, 6),
+    }
+    # Calculats una vegada: la vista en demana per cada cel·la seleccionada
+    COLUMN_FLAGS = [Qt.ItemIsSelectable | Qt.ItemIsEnabled |
+                    Qt.ItemIsEditable] * 4 + [
+        Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsEditable |
+        Qt.ItemIsUserCheckable]
+
+    loading_changed = Signal(bool)
+
+    def __init__(self, data, parent=None, cache_rows=20000):
+        super().__init__(parent)
+        self.db = data
+        self.module_id = None
+        self.primary = "deadline"
+        self.secondary = "deadline"
+        self.order = self.DEFAULT_ORDER
+        self.descending = False
+        self.window = TaskWindow()
+        self.cache = TaskCache(cache_rows)
+        self.requests = 0
+        # Insercions i esborrats del mòdul actual, per saber si una posició
+        # demanada al fil de dades encara val quan arriba
+        self.shifts = 0
+        # Ids de l'últim tasks_deleted, que arriba just abans del
+        # tasks_removed corresponent
+        self.deleted_ids = []
+        # Si hi és, les edicions de cel·les passen per la pila de desfer
+        self.undo_stack = None
+        self.db.tasks_changed.connect(self.on_tasks_changed)
+        self.db.task_inserted.connect(self.on_task_inserted)
+        self.db.tasks_removed.connect(self.on_tasks_removed)
+        self.db.tasks_deleted.connect(self.on_tasks_deleted)
+        self.db.task_updated.connect(self.on_task_updated)
+        self.db.tasks_updated.connect(self.on_tasks_updated)
+        self.db.module_removed.connect(self.on_module_removed)
+
+    def _call(self, method, *args, done):
+        # Crida al fil de dades comptada per a l'estat "carregant"
+        self.requests += 1
+        if self.requests == 1:
+            self.loading_changed.emit(True)
+        self.db.call(method, *args,
+                     done=lambda result: self._finish(done, result),
+                     failed=lambda error: self._finish(self.db.report, error))
+
+    def _finish(self, callback, result):
+        self.requests -= 1
+        if not self.requests:
+            self.loading_changed.emit(False)
+        callback(result)
+
+    def set_module(self, module_id):
+        if module_id == self.module_id:
+            return
+        self.beginResetModel()
+        self.cache.put(self.module_id, self.window)
+        self.module_id = module_id
+        self.window = self.cache.take(module_id) or self._new_window()
+        self.endResetModel()
+
+    def refresh(self):
+        self.beginResetModel()
+        self.window = self._new_window()
+        self.endResetModel()
+
+    def _new_window(self, total=None):
+        # Amb el total ja sabut (canvi d'ordre) no es torna a comptar
+        window = TaskWindow(tuple(self.COLUMNS.index(column)
+                                  for column in self.order) + (0,))
+        if total is not None:
+            window.total = total
+            window.counted = True
+        elif self.module_id is not None:
+            self._call("count_tasks", self.module_id,
+                       done=lambda total: self.on_counted(window, total))
+        return window
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # La capçalera de la vista (setSortingEnabled) crida aquí
+        primary = self.SORT_COLUMNS.get(column)
+        if primary is not None:
+            self.set_order(primary, order == Qt.DescendingOrder,
+                           self.secondary)
+
+    def set_secondary(self, secondary):
+        self.set_order(self.primary, self.descending, secondary)
+
+    def set_order(self, primary, descending, secondary):
+        if secondary not in self.SECONDARY_SORTS:
+            secondary = self.SECONDARY_SORTS[0]
+        self.primary = primary
+        self.secondary = secondary
+        # Sense repetir columnes i amb la data per als empats de "fet"
+        order = list(dict.fromkeys([primary, secondary, "deadline"]))[:2]
+        if order == self.order and descending == self.descending:
+            return
+        window = self.window
+        self.beginResetModel()
+        self.order = order
+        self.descending = descending
+        # Les finestres guardades tenen les claus de l'ordre anterior
+        self.cache = TaskCache(self.cache.max_rows)
+        self.window = self._new_window(
+            window.total if window.counted else None)
+        if self.window.counted:
+            # Abans que les crides dels que escolten el reinici (la
+            # selecció): el fil de dades les atén en ordre
+            self._page(0)
+        self.endResetModel()
+        if self.window.counted:
+            self.fetchMore()
+
+    def default_order(self):
+        # Les posicions de task_inserted i tasks_removed són en aquest ordre
+        return self.order == self.DEFAULT_ORDER and not self.descending
+
+    def on_counted(self, window, total):
+        window.total = total
+        window.counted = True
+        if window is self.window:
+            self.fetchMore()
+
+    @Slot(int)
+    def on_tasks_changed(self, module_id):
+        if module_id == self.module_id:
+            self.refresh()
         else:
-            return super().flags(index)
+            self.cache.invalidate(module_id)
 
-    def data(self, index, role):
-        if index.column() == 4:
-            if role == Qt.CheckStateRole:
-                checked = QSqlTableModel.data(self, index, Qt.DisplayRole)
-                if checked:
-                    return Qt.Checked
-                else:
-                    return Qt.Unchecked
+    @Slot(int, int, object)
+    def on_task_inserted(self, module_id, position, values):
+        # Una sola fila nova: les altres es desplacen sense tornar a llegir
+        row = task_row(*values)
+        if module_id != self.module_id:
+            if self.default_order():
+                self.cache.insert(module_id, position, row, self.PAGE_SIZE)
+            else:
+                self.cache.invalidate(module_id)
+            return
+        self.shifts += 1
+        window = self.window
+        if not window.counted:
+            return
+        if self.default_order():
+            self._insert(window, position, row)
+            return
+        # La posició de l'avís és en l'ordre per data: es demana la de la
+        # vista. Les pàgines que ja són en camí poden portar la fila nova.
+        window.generation += 1
+        shifts = self.shifts
+        self._call("task_position", module_id, row[0], self.order,
+                   self.descending,
+                   done=lambda position: self.on_inserted_position(
+                       window, shifts, position, row))
+
+    def on_inserted_position(self, window, shifts, position, row):
+        if window is not self.window:
+            # Guardada a la memòria cau sense la fila nova
+            self.cache.invalidate(row[1])
+            return
+        if shifts != self.shifts or position is None:
+            # Un altre canvi entremig: la posició ja no és segura
+            self.refresh()
+            return
+        self._insert(window, position, row)
+
+    def _insert(self, window, position, row):
+        if position < window.fetched or window.fetched == window.total:
+            self.beginInsertRows(QModelIndex(), position, position)
+            window.insert(position, row, self.PAGE_SIZE)
+            window.fetched += 1
+            self.endInsertRows()
         else:
-            return QSqlTableModel.data(self, index, role)
+            # Encara no recorreguda: només canvia el total
+            window.insert(position, row, self.PAGE_SIZE)
 
-    def setData(self, index, value, role):
-        if index.column() == 3 and role == Qt.DisplayRole:
-            return super().setData(index, value)
-        if index.column() == 4 and role == Qt.CheckStateRole:
-            if value == Qt.Checked:
-                return super().setData(index, 1)
+    @Slot(object)
+    def on_tasks_deleted(self, task_ids):
+        self.deleted_ids = task_ids
+
+    @Slot(int, object)
+    def on_tasks_removed(self, module_id, positions):
+        if module_id != self.module_id:
+            if self.default_order():
+                self.cache.remove(module_id, positions, self.PAGE_SIZE)
             else:
-                return super().setData(index, 0)
+                self.cache.invalidate(module_id)
+            return
+        self.shifts += 1
+        window = self.window
+        if not window.counted:
+            return
+        if not self.default_order():
+            # Les posicions de l'avís són en l'ordre per data; en el de la
+            # vista es busquen les files esborrades a les pàgines en memòria
+            found = window.positions(self.deleted_ids, self.PAGE_SIZE)
+            if len(found) != len(positions):
+                self.refresh()
+                return
+            positions = sorted(found, reverse=True)
+        for position in positions:
+            if position < window.fetched:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                window.remove(position, self.PAGE_SIZE)
+                window.fetched -= 1
+                self.endRemoveRows()
+            else:
+                window.remove(position, self.PAGE_SIZE)
+
+    @Slot(int)
+    def on_module_removed(self, module_id):
+        self.cache.invalidate(module_id)
+        if module_id == self.module_id:
+            self.beginResetModel()
+            self.module_id = None
+            self.window = TaskWindow()
+            self.endResetModel()
+
+    @Slot(int, int, int, object)
+    def on_task_updated(self, module_id, task_id, column, value):
+        if module_id != self.module_id:
+            self.cache.update(module_id, task_id, column, value)
+        elif column in self.window.key:
+            # Canvia la posició de la fila en l'ordre de la vista
+            self.refresh()
+        else:
+            self._patch(task_id, column, value)
+
+    @Slot(int, object, int, object)
+    def on_tasks_updated(self, module_id, task_ids, column, value):
+        if module_id != self.module_id:
+            self.cache.update_many(module_id, task_ids, column, value)
+        elif column in self.window.key:
+            self.refresh()
         else:
-            return super().setData(index, value, role)
+            # Un dataChanged per pàgina en memòria, no per fila
+            pages = {}
+            for number, offset in self.window.patch_many(task_ids, column,
+                                                         value):
+                first, last = pages.get(number, (offset, offset))
+                pages[number] = (min(first, offset), max(last, offset))
+            for number, (first, last) in pages.items():
+                first += number * self.PAGE_SIZE
+                last += number * self.PAGE_SIZE
+                self.dataChanged.emit(self.index(first, column),
+                                      self.index(last, column))
+
+    def _patch(self, task_id, column, value):
+        position = self.window.patch(task_id, column, value)
+        if position is not None:
+            number, offset = position
+            index = self.index(number * self.PAGE_SIZE + offset, column)
+            self.dataChanged.emit(index, index)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.window.fetched
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.COLUMNS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self.window.fetched < self.window.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        # Només amplia les files; les pàgines arriben quan es pinten
+        if parent.isValid():
+            return
+        window = self.window
+        last = min(window.total, window.fetched + self.PAGE_SIZE)
+        if last > window.fetched:
+            self.beginInsertRows(QModelIndex(), window.fetched, last - 1)
+            window.fetched = last
+            self.endInsertRows()
+
+    def _page(self, number):
+        # Torna la pàgina si ja és en memòria; si no, la demana i torna None
+        window = self.window
+        if number == window.last_number:
+            return window.last_rows
+        rows = window.pages.get(number)
+        if rows is not None:
+            window.pages.move_to_end(number)
+            window.last_number = number
+            window.last_rows = rows
+            return rows
+
+        if number not in window.loading and self.module_id is not None:
+            self._request_page(window, number)
+        return None
+
+    def _request_page(self, window, number, prefetch=False):
+        window.loading.add(number)
+        generation = window.generation
+        self._call("task_page", self.module_id,
+                   window.anchors.get(number), self.PAGE_SIZE,
+                   number * self.PAGE_SIZE, self.order, self.descending,
+                   done=lambda rows: self.on_page(window, number, rows,
+                                                  generation, prefetch))
+
+    def _prefetch(self, window, number):
+        # Les pàgines veïnes d'una que la vista ha demanat, perquè en
+        # desplaçar-se no es vegen files buides. Les avançades no en
+        # demanen més; en memòria continuen sent MAX_PAGES com a molt i
+        # surten les que fa més que no es pinten.
+        for neighbour in (number + 1, number - 1):
+            if neighbour < 0 or neighbour * self.PAGE_SIZE >= window.total:
+                continue
+            if neighbour in window.pages or neighbour in window.loading:
+                continue
+            if len(window.loading) >= self.MAX_PAGES:
+                return
+            self._request_page(window, neighbour, prefetch=True)
+
+    def on_page(self, window, number, rows, generation, prefetch=False):
+        window.loading.discard(number)
+        if generation != window.generation:
+            # Llegida abans d'una inserció o un esborrat: es torna a
+            # demanar quan la vista la pinte
+            if window is self.window:
+                first = number * self.PAGE_SIZE
+                last = min(first + self.PAGE_SIZE, window.fetched) - 1
+                if last >= first:
+                    self.dataChanged.emit(
+                        self.index(first, 0),
+                        self.index(last, len(self.COLUMNS) - 1))
+            return
+        rows = [task_row(*row) for row in rows]
+        if len(rows) == self.PAGE_SIZE:
+            last = rows[-1]
+            window.anchors[number + 1] = window.key_of(last)
+        window.pages[number] = rows
+        while len(window.pages) > self.MAX_PAGES:
+            evicted, _ = window.pages.popitem(last=False)
+            if evicted == window.last_number:
+                window.last_number = None
+                window.last_rows = None
+        if window is self.window and rows:
+            first = number * self.PAGE_SIZE
+            last = min(first + len(rows), window.fetched) - 1
+            if last >= first:
+                self.dataChanged.emit(self.index(first, 0),
+                                      self.index(last, len(self.COLUMNS) - 1))
+            if not prefetch:
+                self._prefetch(window, number)
+
+    def row(self, row):
+        # None si la pàgina encara no ha arribat
+        rows = self._page(row // self.PAGE_SIZE)
+        if rows is None or row % self.PAGE_SIZE >= len(rows):
+            return None
+        return rows[row % self.PAGE_SIZE]
+
+    def cached_row(self, row):
+        # Com row(), però sense demanar la pàgina si no és en memòria
+        rows = self.window.pages.get(row // self.PAGE_SIZE)
+        if rows is None or row % self.PAGE_SIZE >= len(rows):
+            return None
+        return rows[row % self.PAGE_SIZE]
+
+    def task_id(self, row):
+        values = self.row(row)
+        return None if values is None else values[0]
+
+    def task_ids(self, rows, done):
+        # Identificadors de les files donades. Si alguna no és en memòria es
+        # demanen tots els del mòdul d'una vegada
+        window = self.window
+        ids = []
+        for row in rows:
+            values = self.cached_row(row)
+            if values is None:
+                break
+            ids.append(values[0])
+        else:
+            done(ids)
+            return
+        self._call("task_ids", self.module_id, self.order, self.descending,
+                   done=lambda all_ids: self.on_task_ids(window, rows,
+                                                         all_ids, done))
+
+    def on_task_ids(self, window, rows, all_ids, done):
+        if window is self.window:
+            done([all_ids[row] for row in rows if row < len(all_ids)])
+
+    def row_of(self, task_id, done):
+        # Posició de la tasca en l'ordre de la vista; amplia les files
+        # recorregudes fins a ella si cal
+        window = self.window
+        self._call("task_position", self.module_id, task_id, self.order,
+                   self.descending,
+                   done=lambda row: self.on_position(window, row, done))
+
+    def on_position(self, window, row, done):
+        if row is None or window is not self.window:
+            done(None)
+            return
+        self._fetch_to(window, row)
+        done(row)
+
+    def rows_of(self, task_ids, done):
+        # Com row_of() per a moltes tasques d'una consulta: {id: fila}
+        window = self.window
+        if self.module_id is None or not task_ids:
+            done({})
+            return
+        self._call("task_positions", self.module_id, list(task_ids),
+                   self.order, self.descending,
+                   done=lambda rows: self.on_positions(window, rows, done))
+
+    def on_positions(self, window, rows, done):
+        if window is not self.window:
+            done({})
+            return
+        if rows:
+            self._fetch_to(window, max(rows.values()))
+        done(rows)
+
+    def _fetch_to(self, window, row):
+        if row >= window.fetched:
+            last = min(window.total,
+                       (row // self.PAGE_SIZE + 1) * self.PAGE_SIZE)
+            self.beginInsertRows(QModelIndex(), window.fetched, last - 1)
+            window.fetched = last
+            self.endInsertRows()
+
+    def descriptions(self, done):
+        # Descripcions de totes les files, per al filtre
+        window = self.window
+        if self.module_id is None:
+            done([])
+            return
+        self._call("task_descriptions", self.module_id, self.order,
+                   self.descending,
+                   done=lambda texts: self.on_descriptions(window, texts,
+                                                           done))
+
+    def on_descriptions(self, window, texts, done):
+        if window is self.window:
+            done(texts)
+
+    def fetch_all(self):
+        # Només amplia el recompte; les pàgines es llegeixen en demanar-les
+        window = self.window
+        if window.fetched < window.total:
+            self.beginInsertRows(QModelIndex(), window.fetched,
+                                 window.total - 1)
+            window.fetched = window.total
+            self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS.get(section, self.COLUMNS[section])
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        return self.COLUMN_FLAGS[index.column()]
+
+    def data(self, index, role=Qt.DisplayRole):
+        # Un sol camí per rol: quin camp de task_row() respon cada columna
+        fields = self.ROLE_FIELDS.get(role)
+        if fields is None or not index.isValid():
+            return None
+        field = fields[index.column()]
+        if field is None:
+            return None
+        number, offset = divmod(index.row(), self.PAGE_SIZE)
+        rows = self._page(number)
+        if rows is None or offset >= len(rows):
+            return None
+        return rows[offset][field]
+
+    def setData(self, index, value, role=Qt.EditRole):
+        column = index.column()
+        if column == 4 and role == Qt.CheckStateRole:
+            value = 1 if value == Qt.Checked else 0
+        elif column not in (2, 3) or \
+                role not in (Qt.DisplayRole, Qt.EditRole):
+            return False
+
+        values = self.row(index.row())
+        if values is None:
+            return False
+        task_id = values[0]
+        if values[column] == value:
+            return True
+        # Es mostra de seguida; el senyal task_updated ho confirma
+        if column not in self.window.key:
+            self._patch(task_id, column, value)
+        if self.undo_stack is not None:
+            self.undo_stack.push(EditTaskCommand(
+                self.db, self.module_id, task_id, self.COLUMNS[column],
+                values[column], value))
+        else:
+            self.db.call("queue_update", self.module_id, task_id,
+                         self.COLUMNS[column], value)
+        return True
+
+
+class TaskFilterModel(QAbstractProxyModel):
+    # Filtre incremental per descripció sobre TaskModel. Recorre les files
+    # a trossos de SLICE_MS perquè l'entrada no es bloqueja mai, i si el
+    # text només s'allarga torna a mirar només les files que ja passaven.
+    SLICE_MS = 4
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.needle = ""
+        self.rows = None
+        self.positions = {}
+        # Descripcions en minúscules de totes les files; None fins que
+        # arriben del fil de dades
+        self.texts = None
+        self.texts_requested = False
+        self.candidates = iter(())
+        self.complete = True
+        self.job = QTimer(self)
+        self.job.setInterval(0)
+        self.job.timeout.connect(self._work)
+
+    def setSourceModel(self, model):
+        super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.on_source_about_to_be_reset)
+        model.modelReset.connect(self.on_source_reset)
+        model.rowsAboutToBeInserted.connect(self.on_rows_about_to_be_inserted)
+        model.rowsInserted.connect(self.on_rows_inserted)
+        model.rowsAboutToBeRemoved.connect(self.on_rows_about_to_be_removed)
+        model.rowsRemoved.connect(self.on_rows_removed)
+        model.dataChanged.connect(self.on_data_changed)
+
+    def set_filter(self, text):
+        needle = text.casefold().strip()
+        if needle == self.needle:
+            return
+        if not needle:
+            self.job.stop()
+            self.beginResetModel()
+            self.needle = ""
+            self.rows = None
+            self.positions = {}
+            self.endResetModel()
+            return
+
+        if self.needle and needle.startswith(self.needle) and self.complete:
+            self._start(needle, self.rows)
+        elif self.texts is None:
+            # Sense resultats fins que arriben les descripcions
+            self._start(needle, ())
+            self.complete = False
+            self.job.stop()
+            if not self.texts_requested:
+                self.texts_requested = True
+                self.sourceModel().descriptions(self.on_descriptions)
+        else:
+            source = self.sourceModel()
+            source.fetch_all()
+            self._start(needle, range(min(len(self.texts),
+                                          source.rowCount())))
+
+    def on_descriptions(self, texts):
+        self.texts = [text.casefold() for text in texts]
+        if self.needle:
+            needle = self.needle
+            self.needle = ""
+            self.set_filter(needle)
+
+    def _start(self, needle, candidates):
+        self.beginResetModel()
+        self.needle = needle
+        self.rows = []
+        self.positions = {}
+        self.candidates = iter(candidates)
+        self.complete = False
+        self.endResetModel()
+        self.job.start()
+
+    @Slot()
+    def _work(self):
+        start = time.perf_counter_ns() if recorder.enabled else 0
+        deadline = time.perf_counter() + self.SLICE_MS / 1000
+        found = []
+        self.complete = True
+        for row in self.candidates:
+            if self.needle in self.texts[row]:
+                found.append(row)
+            if time.perf_counter() > deadline:
+                self.complete = False
+                break
+        if found:
+            first = len(self.rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(found) - 1)
+            for offset, row in enumerate(found):
+                self.positions[row] = first + offset
+            self.rows.extend(found)
+            self.endInsertRows()
+        if self.complete:
+            self.job.stop()
+        if start:
+            recorder.span("filter", "slice", start, {"found": len(found)})
+
+    @Slot()
+    def on_source_about_to_be_reset(self):
+        self.job.stop()
+        self.beginResetModel()
+
+    @Slot()
+    def on_source_reset(self):
+        self.texts = None
+        self.texts_requested = False
+        needle = self.needle
+        self.needle = ""
+        self.rows = None
+        self.positions = {}
+        self.endResetModel()
+        if needle:
+            self.set_filter(needle)
+
+    @Slot(QModelIndex, int, int)
+    def on_rows_about_to_be_inserted(self, parent, first, last):
+        if self.rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    @Slot(QModelIndex, int, int)
+    def on_rows_inserted(self, parent, first, last):
+        if self.rows is None:
+            self.endInsertRows()
+            return
+        source = self.sourceModel()
+        if self.texts is None or len(self.texts) == source.window.total:
+            # Les descripcions que arriben ja inclouen les files noves, o
+            # només s'han recorregut files que ja hi eren
+            return
+        values = [source.cached_row(row) for row in range(first, last + 1)]
+        if not self.complete or None in values:
+            self._restart()
+            return
+        count = last - first + 1
+        self.texts[first:first] = [value[2].casefold() for value in values]
+        start = bisect_left(self.rows, first)
+        self.rows[start:] = [row + count for row in self.rows[start:]]
+        found = [row for row in range(first, last + 1)
+                 if self.needle in self.texts[row]]
+        if found:
+            self.beginInsertRows(QModelIndex(), start,
+                                 start + len(found) - 1)
+            self.rows[start:start] = found
+            self.endInsertRows()
+        self.positions = {row: position
+                          for position, row in enumerate(self.rows)}
+
+    @Slot(QModelIndex, int, int)
+    def on_rows_about_to_be_removed(self, parent, first, last):
+        if self.rows is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+        start = bisect_left(self.rows, first)
+        end = bisect_right(self.rows, last)
+        if end > start:
+            self.beginRemoveRows(QModelIndex(), start, end - 1)
+            del self.rows[start:end]
+            self.endRemoveRows()
+
+    @Slot(QModelIndex, int, int)
+    def on_rows_removed(self, parent, first, last):
+        if self.rows is None:
+            self.endRemoveRows()
+            return
+        if self.texts is None:
+            return
+        if not self.complete:
+            self._restart()
+            return
+        count = last - first + 1
+        del self.texts[first:last + 1]
+        start = bisect_left(self.rows, first)
+        self.rows[start:] = [row - count for row in self.rows[start:]]
+        self.positions = {row: position
+                          for position, row in enumerate(self.rows)}
+
+    def _restart(self):
+        # Torna a demanar les descripcions i a filtrar des del principi
+        self.on_source_about_to_be_reset()
+        self.on_source_reset()
+
+    @Slot(QModelIndex, QModelIndex, "QList<int>")
+    def on_data_changed(self, top_left, bottom_right, roles=[]):
+        rows = range(top_left.row(), bottom_right.row() + 1)
+        if self.texts is not None:
+            for row in rows:
+                values = self.sourceModel().cached_row(row)
+                if row < len(self.texts) and values is not None:
+                    self.texts[row] = values[2].casefold()
+        if self.rows is None:
+            self.dataChanged.emit(
+                self.index(top_left.row(), top_left.column()),
+                self.index(bottom_right.row(), bottom_right.column()), roles)
+            return
+        for row in rows:
+            top = self.mapFromSource(top_left.siblingAtRow(row))
+            if top.isValid():
+                bottom = top.siblingAtColumn(bottom_right.column())
+                self.dataChanged.emit(top, bottom, roles)
+
+    def source_rows(self, first, last):
+        # Files del model font per a un tram de files del filtre
+        if self.rows is None:
+            return range(first, last + 1)
+        return self.rows[first:last + 1]
+
+    def mapToSource(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        row = index.row() if self.rows is None else self.rows[index.row()]
+        return self.sourceModel().index(row, index.column())
+
+    def mapFromSource(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        if self.rows is None:
+            return self.index(index.row(), index.column())
+        row = self.positions.get(index.row())
+        if row is None:
+            return QModelIndex()
+        return self.index(row, index.column())
+
+    def index(self, row, column, parent=QModelIndex()):
+        # Es crida per cada cel·la de la selecció: sense passar per
+        # rowCount() ni columnCount()
+        source = self.sourceModel()
+        count = source.window.fetched if self.rows is None else len(self.rows)
+        if parent.isValid() or not (0 <= row < count) or \
+                not (0 <= column < len(source.COLUMNS)):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        if self.rows is None:
+            return self.sourceModel().rowCount()
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return self.rows is None and self.sourceModel().canFetchMore()
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.rows is None:
+            self.sourceModel().fetchMore()
+
+    def flags(self, index):
+        # Les opcions només depenen de la columna: no cal mapToSource()
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return self.sourceModel().COLUMN_FLAGS[index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            return self.sourceModel().headerData(section, orientation, role)
+        return super().headerData(section, orientation, role)
 
 
 if __name__ == "__main__":
     app = QApplication([])
 
-    ventana1 = MainWindow()
+    # python app3.py --startup-time: mostra els temps d'arrencada i tanca
+    ventana1 = MainWindow(startup_time="--startup-time" in sys.argv)
     ventana1.setMinimumSize(800, 400)
     ventana1.show()
 
@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+
+from core import LOGGED_TABLES, default_path
+
+# Còpies de seguretat en calent, mentre l'aplicació escriu. Una instantània
+# és una còpia sencera feta amb l'API de còpia en línia de SQLite; després
+# només s'envien les entrades noves de change_log, en fitxers JSON Lines.
+# Exemple per a cron cada 5 minuts:
+#   python backup.py backup còpies/
+# i per recuperar-la en un fitxer nou:
+#   python backup.py restore còpies/ recuperada.sqlite
+#
+# Aquest programa no carrega el SQLite de Qt: dos SQLite en el mateix
+# procés no veuen els bloquejos l'un de l'altre.
+
+BUSY_TIMEOUT = 5
+# Amb més entrades enviades des de l'última instantània se'n fa una altra
+SNAPSHOT_CHANGES = 500000
+# Instantànies (amb els seus registres) que es conserven
+KEEP_SNAPSHOTS = 2
+SNAPSHOT = re.compile(r"snapshot-(\d+)\.sqlite$")
+CHANGES = re.compile(r"changes-(\d+)-(\d+)\.jsonl$")
+
+
+class BackupError(Exception):
+    pass
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT,
+                                 isolation_level=None)
+    connection.execute("PRAGMA foreign_keys = 1")
+    return connection
+
+
+def log_sequence(connection):
+    # Últim seq assignat, encara que les entrades ja s'hagen buidat
+    row = connection.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+    ).fetchone()
+    return row[0] if row else 0
+
+
+class BackupDir():
+    # snapshot-<seq>.sqlite porta els canvis fins a seq inclòs i
+    # changes-<primer>-<últim>.jsonl els que van darrere, sense buits
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def snapshots(self):
+        return sorted(int(match.group(1)) for match in map(
+            SNAPSHOT.match, os.listdir(self.path)) if match)
+
+    def changes(self, after=0):
+        return sorted((int(match.group(1)), int(match.group(2)))
+                      for match in map(CHANGES.match, os.listdir(self.path))
+                      if match and int(match.group(1)) > after)
+
+    def snapshot_path(self, seq):
+        return os.path.join(self.path, f"snapshot-{seq:012d}.sqlite")
+
+    def changes_path(self, first, last):
+        return os.path.join(self.path,
+                            f"changes-{first:012d}-{last:012d}.jsonl")
+
+    def last_seq(self):
+        snapshots = self.snapshots()
+        if not snapshots:
+            return None
+        changes = self.changes(snapshots[-1])
+        return changes[-1][1] if changes else snapshots[-1]
+
+    def write(self, path, write):
+        # Fitxer temporal i rename: una còpia a mitges no es veu mai
+        partial = path + ".partial"
+        with open(partial, "w", encoding="utf-8") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(partial, path)
+
+    def prune(self):
+        snapshots = self.snapshots()
+        if len(snapshots) <= KEEP_SNAPSHOTS:
+            return
+        oldest = snapshots[-KEEP_SNAPSHOTS]
+        for seq in snapshots[:-KEEP_SNAPSHOTS]:
+            os.remove(self.snapshot_path(seq))
+        for first, last in self.changes():
+            if last <= oldest:
+                os.remove(self.changes_path(first, last))
+
+
+def snapshot(source, backups):
+    partial = backups.snapshot_path(0) + ".partial"
+    target = sqlite3.connect(partial)
+    try:
+        # Tot d'una passada: la còpia és la base de dades d'un sol instant
+        source.backup(target)
+        seq = log_sequence(target)
+        # El registre de la còpia ja és dins de la còpia
+        target.execute("DELETE FROM change_log")
+        target.commit()
+    finally:
+        target.close()
+    with open(partial, "rb+") as file:
+        os.fsync(file.fileno())
+    os.replace(partial, backups.snapshot_path(seq))
+    trim(source, seq)
+    backups.prune()
+    return seq
+
+
+def ship(source, backups, last):
+    # Les entrades posteriors a l'última enviada, en una sola lectura
+    rows = source.execute(
+        "SELECT seq, tbl, row_id, row FROM change_log WHERE seq > ?"
+        " ORDER BY seq", (last,)).fetchall()
+    if not rows:
+        return 0
+    if rows[0][0] != last + 1:
+        raise BackupError(
+            f"El registre de canvis ja no té l'entrada {last + 1}")
+
+    def write(file):
+        for seq, table, row_id, row in rows:
+            file.write(f'[{seq},"{table}",{row_id},{row or "null"}]\n')
+
+    backups.write(backups.changes_path(rows[0][0], rows[-1][0]), write)
+    trim(source, rows[-1][0])
+    return len(rows)
+
+
+def trim(source, seq):
+    # La base de dades només guarda el que encara no és a les còpies
+    source.execute("DELETE FROM change_log WHERE seq <= ?", (seq,))
+
+
+def backup(args):
+    backups = BackupDir(args.dir)
+    source = connect(args.db or default_path())
+    try:
+        last = backups.last_seq()
+        snapshots = backups.snapshots()
+        if last is not None and not args.full and \
+                last - snapshots[-1] < SNAPSHOT_CHANGES:
+            try:
+                count = ship(source, backups, last)
+            except BackupError as error:
+                print(f"{error}: es fa una instantània nova")
+            else:
+                print(f"{count} canvis enviats")
+                return
+        print(f"Instantània fins al canvi {snapshot(source, backups)}")
+    finally:
+        source.close()
+
+
+def restore(args):
+    # L'última instantània i els seus registres, en un fitxer nou
+    backups = BackupDir(args.dir)
+    if os.path.exists(args.target):
+        raise BackupError(f"{args.target} ja existeix")
+    snapshots = backups.snapshots()
+    if not snapshots:
+        raise BackupError(f"No hi ha cap instantània a {args.dir}")
+    seq = snapshots[-1]
+    copy = sqlite3.connect(backups.snapshot_path(seq))
+    target = connect(args.target)
+    try:
+        copy.backup(target)
+        statements = {table: replay_statements(table, columns)
+                      for table, columns in LOGGED_TABLES.items()}
+        target.execute("BEGIN")
+        count = 0
+        for first, last in backups.changes(seq):
+            if first != seq + 1:
+                raise BackupError(f"Falten els canvis {seq + 1}-{first - 1}")
+            with open(backups.changes_path(first, last),
+                      encoding="utf-8") as file:
+                for line in file:
+                    seq, table, row_id, row = json.loads(line)
+                    upsert, delete = statements[table]
+                    if row is None:
+                        target.execute(delete, (row_id,))
+                    else:
+                        target.execute(upsert, row)
+                    count += 1
+        # Els triggers han tornat a registrar els canvis aplicats; el
+        # registre de la base recuperada continua on es va quedar
+        target.execute("DELETE FROM change_log")
+        target.execute(
+            "UPDATE sqlite_sequence SET seq = ? WHERE name = 'change_log'",
+            (seq,))
+        target.execute("COMMIT")
+    except BaseException:
+        target.close()
+        os.remove(args.target)
+        raise
+    finally:
+        copy.close()
+    target.close()
+    print(f"Recuperada fins al canvi {seq} ({count} canvis aplicats)")
+
+
+def replay_statements(table, columns):
+    # Upsert en lloc de REPLACE: REPLACE esborra la fila i un mòdul
+    # s'emportaria les seues tasques
+    updates = ", ".join(f"{column} = excluded.{column}"
+                        for column in columns[1:])
+    upsert = f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES ({", ".join("?" * len(columns))})
+        ON CONFLICT (id) DO UPDATE SET {updates}
+        """
+    return upsert, f"DELETE FROM {table} WHERE id = ?"
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Còpies de seguretat incrementals de Tasques per mòdul")
+    parser.add_argument("--db", help="fitxer SQLite (per defecte data.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser(
+        "backup", help="envia els canvis nous o fa una instantània")
+    command.add_argument("dir", help="carpeta de les còpies")
+    command.add_argument("--full", action="store_true",
+                         help="fes una instantània encara que no calga")
+    command.set_defaults(run=backup)
+
+    command = commands.add_parser(
+        "restore", help="recupera l'última còpia en un fitxer nou")
+    command.add_argument("dir", help="carpeta de les còpies")
+    command.add_argument("target", help="fitxer SQLite que es crearà")
+    command.set_defaults(run=restore)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        args.run(args)
+    except (BackupError, sqlite3.Error, OSError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Mesures de rendiment de l'aplicació sense pantalla sobre una base de
+# dades sintètica. Exemple:
+#   python bench.py --modules 10 --tasks 100000 --output abans.json
+#   python bench.py --compare abans.json --output despres.json
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QSettings, Qt, qVersion  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from core import Data  # noqa: E402
+
+WORDS = ["pràctica", "examen", "lliurament", "exercici", "projecte",
+         "memòria", "qüestionari", "revisió"]
+
+
+def generate(path, modules, tasks):
+    # Cada mòdul amb `tasks` tasques, dates en dos anys i un terç fetes
+    data = Data(path, "bench", pragmas={"synchronous": "OFF"})
+    data.connection.transaction()
+    # Sense els mòduls d'exemple de la primera migració
+    data.query("DELETE FROM module")
+    words = ", ".join(f"'{word}'" for word in WORDS)
+    for number in range(1, modules + 1):
+        module_id = data.add_module(f"Mòdul {number}")
+        data.query(
+            f"""
+            WITH RECURSIVE n(i) AS (
+                SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i + 1 < ?
+            )
+            INSERT INTO task (module_id, description, deadline, finished)
+            SELECT ?, printf('Tasca %d: %s', i,
+                             json_extract(json_array({words}),
+                                          printf('$[%d]', i % {len(WORDS)}))),
+                   date('2024-01-01', printf('+%d days', (i * 7) % 730)),
+                   i % 3 = 0
+            FROM n
+            """, (tasks, module_id))
+    data.commit()
+    data.connection.close()
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["module", "description", "deadline", "finished"])
+        for number in range(rows):
+            writer.writerow(["Importades", f"Importada {number}",
+                             f"2025-{number % 12 + 1:02d}-{number % 28 + 1:02d}",
+                             number % 2])
+
+
+def wait(app, condition, timeout=120):
+    end = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > end:
+            raise TimeoutError("el benchmark no ha acabat a temps")
+        app.processEvents()
+
+
+def summary(samples):
+    samples = sorted(samples)
+    return {
+        "ms": [round(sample, 3) for sample in samples],
+        "median": round(statistics.median(samples), 3),
+        "p95": round(samples[min(len(samples) - 1,
+                                 int(len(samples) * 0.95))], 3),
+        "max": round(samples[-1], 3),
+    }
+
+
+class Bench():
+    def __init__(self, app, args):
+        self.app = app
+        self.args = args
+        self.results = {}
+
+    def measure(self, name, samples):
+        self.results[name] = summary(samples)
+        print(f"{name:24} mediana {self.results[name]['median']:10.3f} ms",
+              file=sys.stderr)
+
+    def idle(self):
+        # Mòduls carregats i cap petició de tasques pendent
+        return self.window.module_model.rowCount() > 0 and \
+            not self.window.task_model.requests
+
+    def run(self):
+        import app3
+
+        start = time.perf_counter()
+        self.window = app3.MainWindow()
+        self.window.resize(1000, 600)
+        self.window.show()
+        task_model = self.window.task_model
+        wait(self.app, lambda: task_model.window.pages and self.idle())
+        self.app.processEvents()
+        self.measure("cold_start", [(time.perf_counter() - start) * 1000])
+
+        self.module_switch()
+        self.filter()
+        self.toggle()
+        self.scroll()
+        self.resort()
+        self.bulk_insert()
+        # La finestra es tanca quan el fil de dades ha desat
+        self.window.close()
+        wait(self.app, lambda: not self.window.isVisible())
+        return self.results
+
+    def select_module(self, row):
+        view = self.window.module_component.view
+        start = time.perf_counter()
+        view.setCurrentIndex(self.window.module_model.index(row, 1))
+        task_model = self.window.task_model
+        wait(self.app, lambda: 0 in task_model.window.pages and self.idle())
+        return (time.perf_counter() - start) * 1000
+
+    def module_switch(self):
+        rows = range(self.window.module_model.rowCount())
+        # La primera visita llegeix de la base de dades; la segona, de la
+        # memòria cau de finestres
+        self.measure("module_switch_cold",
+                     [self.select_module(row) for row in rows[1:]])
+        self.measure("module_switch_warm",
+                     [self.select_module(row) for row in rows])
+
+    def filter(self):
+        task_filter = self.window.task_filter
+        samples = {"filter_first": [], "filter_refine": []}
+        for repeat in range(self.args.repeat):
+            for name, needle in (("filter_first", "12"),
+                                 ("filter_refine", "123")):
+                start = time.perf_counter()
+                task_filter.set_filter(needle)
+                wait(self.app, lambda: task_filter.texts is not None and
+                     task_filter.complete)
+                samples[name].append((time.perf_counter() - start) * 1000)
+            task_filter.set_filter("")
+            # Les descripcions es tornen a demanar a cada repetició
+            self.window.task_model.refresh()
+            wait(self.app, self.idle)
+        for name, values in samples.items():
+            self.measure(name, values)
+
+    def toggle(self):
+        task_model = self.window.task_model
+        updated = []
+        task_model.db.task_updated.connect(lambda *args: updated.append(1))
+        local = []
+        confirmed = []
+        for row in range(self.args.repeat * 10):
+            index = task_model.index(row, 4)
+            state = Qt.Unchecked if index.data(Qt.CheckStateRole) == \
+                Qt.Checked else Qt.Checked
+            updated.clear()
+            start = time.perf_counter()
+            task_model.setData(index, state, Qt.CheckStateRole)
+            local.append((time.perf_counter() - start) * 1000)
+            wait(self.app, lambda: updated)
+            confirmed.append((time.perf_counter() - start) * 1000)
+        self.measure("toggle_local", local)
+        self.measure("toggle_confirmed", confirmed)
+
+    def scroll(self):
+        task_model = self.window.task_model
+        view = self.window.tasks_component.view
+        task_model.fetch_all()
+        self.app.processEvents()
+        scroll_bar = view.verticalScrollBar()
+        frames = self.args.frames
+        step = max(1, scroll_bar.maximum() // frames)
+        repaint = []
+        with_load = []
+        for frame in range(frames):
+            start = time.perf_counter()
+            scroll_bar.setValue(frame * step)
+            view.viewport().repaint()
+            wait(self.app, self.idle)
+            painted = time.perf_counter()
+            view.viewport().repaint()
+            repaint.append((time.perf_counter() - painted) * 1000)
+            with_load.append((time.perf_counter() - start) * 1000)
+        self.measure("scroll_repaint", repaint)
+        self.measure("scroll_with_load", with_load)
+
+    def resort(self):
+        # Fins a la primera pàgina en l'ordre nou, que llig SQL per índex
+        task_model = self.window.task_model
+        header = self.window.tasks_component.view.horizontalHeader()
+        samples = []
+        for repeat in range(self.args.repeat):
+            for column, order in ((2, Qt.AscendingOrder),
+                                  (4, Qt.DescendingOrder),
+                                  (3, Qt.AscendingOrder)):
+                start = time.perf_counter()
+                header.setSortIndicator(column, order)
+                wait(self.app, lambda: 0 in task_model.window.pages and
+                     self.idle())
+                samples.append((time.perf_counter() - start) * 1000)
+        self.measure("resort", samples)
+
+    def bulk_insert(self):
+        samples = []
+        for repeat in range(self.args.repeat):
+            path = os.path.join(self.args.workdir, f"import-{repeat}.csv")
+            write_csv(path, self.args.import_rows)
+            done = []
+            start = time.perf_counter()
+            self.window.data.call("import_tasks", path, done=done.append)
+            wait(self.app, lambda: done)
+            samples.append((time.perf_counter() - start) * 1000)
+        self.measure("bulk_insert", samples)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+            text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    if old["params"] != new["params"]:
+        print(f"Atenció: paràmetres diferents ({old['params']})")
+    print(f"{'mesura':24} {'abans':>10} {'ara':>10} {'canvi':>8}")
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"] if before["median"] \
+            else float("inf")
+        print(f"{name:24} {before['median']:10.3f} {result['median']:10.3f} "
+              f"{ratio:7.2f}x")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark de Tasques per mòdul sense pantalla")
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=100000,
+                        help="tasques per mòdul")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=50,
+                        help="passos de desplaçament")
+    parser.add_argument("--import-rows", type=int, default=10000)
+    parser.add_argument("--cache", default=tempfile.gettempdir(),
+                        help="directori on es guarden les bases generades")
+    parser.add_argument("--output", help="fitxer JSON de resultats")
+    parser.add_argument("--compare", help="resultats anteriors per comparar")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = QApplication(sys.argv[:1])
+
+    # La base generada es reutilitza entre execucions; se'n mesura una còpia
+    # perquè els canvis del benchmark no afecten la següent. La versió de
+    # l'esquema va al nom: una base antiga faria les migracions dins de
+    # cold_start.
+    pristine = os.path.join(
+        args.cache, f"tasques-bench-{args.modules}x{args.tasks}"
+                    f"-v{len(Data.MIGRATIONS)}.sqlite")
+    if not os.path.exists(pristine):
+        print(f"Generant {pristine}...", file=sys.stderr)
+        generate(pristine + ".tmp", args.modules, args.tasks)
+        os.replace(pristine + ".tmp", pristine)
+    args.workdir = tempfile.mkdtemp(prefix="tasques-bench-")
+    path = os.path.join(args.workdir, "data.sqlite")
+    shutil.copy(pristine, path)
+    os.environ["TASQUES_DB"] = path
+    # L'ordre guardat per l'usuari no afecta les mesures
+    for settings_format in (QSettings.NativeFormat, QSettings.IniFormat):
+        QSettings.setPath(settings_format, QSettings.UserScope,
+                          args.workdir)
+
+    try:
+        results = Bench(app, args).run()
+    finally:
+        shutil.rmtree(args.workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "qt": qVersion(),
+        "platform": platform.platform(),
+        "params": {"modules": args.modules, "tasks": args.tasks,
+                   "repeat": args.repeat, "frames": args.frames,
+                   "import_rows": args.import_rows},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            compare(json.load(file), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import argparse
+import sys
+
+from PySide6.QtCore import QCoreApplication
+
+from core import Data, DataError, parse_deadline
+
+# Ordres sense interfície gràfica sobre la mateixa base de dades que app3.py.
+# Exemple: python cli.py list --overdue
+
+
+def list_tasks(data, args):
+    module_id = data.module_id(args.module) if args.module else None
+    for task_id, module, description, deadline, finished in data.iter_tasks(
+            module_id, pending=args.pending, overdue=args.overdue):
+        done = "x" if finished else " "
+        print(f"{task_id}\t[{done}]\t{deadline}\t{module}\t{description}")
+
+
+def add_task(data, args):
+    module_id = data.module_id(args.module)
+    deadline = parse_deadline(args.deadline, 1)
+    print(data.add_task(module_id, args.description, deadline))
+
+
+def done_tasks(data, args):
+    updated = data.set_finished(args.ids, 0 if args.undo else 1)
+    print(f"{len(updated)} tasques actualitzades")
+
+
+def import_tasks(data, args):
+    print(f"{data.import_tasks(args.path)} tasques importades")
+
+
+def export_tasks(data, args):
+    module_id = data.module_id(args.module) if args.module else None
+    print(f"{data.export_tasks(args.path, module_id)} tasques exportades")
+
+
+def show_stats(data, args):
+    print("mòdul\tfetes\ttotal\tendarrerides")
+    for name, total, done, overdue in data.stats():
+        print(f"{name}\t{done}\t{total}\t{overdue}")
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Tasques per mòdul")
+    parser.add_argument("--db", help="fitxer SQLite (per defecte data.sqlite)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("list", help="llista tasques")
+    command.add_argument("--module", help="nom del mòdul")
+    command.add_argument("--pending", action="store_true",
+                         help="només les no fetes")
+    command.add_argument("--overdue", action="store_true",
+                         help="només les no fetes amb el termini passat")
+    command.set_defaults(run=list_tasks)
+
+    command = commands.add_parser("add", help="afegeix una tasca")
+    command.add_argument("module")
+    command.add_argument("description")
+    command.add_argument("deadline", help="yyyy-MM-dd o dd/MM/yyyy")
+    command.set_defaults(run=add_task)
+
+    command = commands.add_parser("done", help="marca tasques com a fetes")
+    command.add_argument("ids", type=int, nargs="+")
+    command.add_argument("--undo", action="store_true",
+                         help="marca-les com a no fetes")
+    command.set_defaults(run=done_tasks)
+
+    command = commands.add_parser("import", help="importa un CSV o JSON")
+    command.add_argument("path")
+    command.set_defaults(run=import_tasks)
+
+    command = commands.add_parser("export", help="exporta a CSV o JSON")
+    command.add_argument("path")
+    command.add_argument("--module", help="nom del mòdul")
+    command.set_defaults(run=export_tasks)
+
+    command = commands.add_parser("stats", help="resum per mòdul")
+    command.set_defaults(run=show_stats)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # QSqlDatabase necessita una aplicació, però no cal cap pantalla
+    app = QCoreApplication(sys.argv[:1])
+    try:
+        data = Data(args.db)
+        data.retry(args.run, data, args)
+        data.retry(data.flush)
+    except DataError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    finally:
+        app.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
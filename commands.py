@@ -0,0 +1,231 @@
+from array import array
+from collections import deque
+
+from PySide6.QtCore import Slot
+from PySide6.QtGui import QUndoCommand, QUndoStack
+
+# Ordres desfer/refer sobre AsyncData. Cada ordre guarda només el que cal
+# per anar i tornar: ids, valors d'una cel·la o el lot de la paperera on
+# Data ha copiat les files esborrades, mai les files en memòria.
+
+
+class UndoStack(QUndoStack):
+    # Amb un límit d'ordres la memòria no creix en sessions llargues. Els
+    # lots de la paperera de les ordres que es descarten (per l'antiguitat
+    # o en fer una altra cosa després de desfer) es buiden en el moment, i
+    # els de les que queden, en tancar. Els d'altres sessions no es toquen:
+    # en obrir només es descarten els de fa més de Data.TRASH_DAYS dies.
+    def __init__(self, data, limit=100, parent=None):
+        super().__init__(parent)
+        self.db = data
+        self.setUndoLimit(limit)
+        self.commands = []
+        self.db.opened.connect(self.on_opened)
+
+    @Slot()
+    def on_opened(self):
+        # Amb el servei de sync.py la paperera és de tots els clients i la
+        # buida el servei en arrencar
+        if self.db.server is None:
+            self.db.call("expire_trash")
+
+    def push(self, command):
+        super().push(command)
+        self.commands.append(command)
+        alive = {id(self.command(row)) for row in range(self.count())}
+        dropped = [command for command in self.commands
+                   if id(command) not in alive]
+        if not dropped:
+            return
+        self.commands = [command for command in self.commands
+                         if id(command) in alive]
+        batches = [command.batch for command in dropped
+                   if getattr(command, "batch", None) is not None]
+        if batches:
+            self.db.call("purge_trash", batches)
+
+    def purge(self):
+        # En tancar la finestra ja no es pot desfer res d'aquesta sessió
+        batches = [command.batch for command in self.commands
+                   if getattr(command, "batch", None) is not None]
+        if batches:
+            self.db.call("purge_trash", batches)
+        self.clear()
+        self.commands = []
+
+
+class DataCommand(QUndoCommand):
+    # Les crides d'una ordre van en sèrie: la següent pot necessitar el
+    # resultat de l'anterior (l'id creat o el lot de la paperera)
+    def __init__(self, data, text, failed=None):
+        super().__init__(text)
+        self.db = data
+        self.failed = failed
+        self.batch = None
+        self.steps = deque()
+
+    def step(self, method, args, done=None):
+        # args és una funció perquè es calcula en el moment de la crida
+        self.steps.append((method, args, done))
+        if len(self.steps) == 1:
+            self._next()
+
+    def _next(self):
+        method, args, _ = self.steps[0]
+        self.db.call(method, *args(), done=self._done, failed=self._failed)
+
+    def _done(self, result):
+        _, _, done = self.steps.popleft()
+        if done is not None:
+            done(result)
+        if self.steps:
+            self._next()
+
+    def _failed(self, error):
+        self.steps.clear()
+        if self.failed is not None:
+            self.failed(error)
+        else:
+            self.db.report(error)
+
+    def set_batch(self, batch):
+        self.batch = batch
+
+
+class AddTaskCommand(DataCommand):
+    def __init__(self, data, module_id, description, deadline, failed=None):
+        super().__init__(data, f"Afegir «{description}»", failed)
+        self.values = (module_id, description, deadline)
+        self.task_id = None
+
+    def redo(self):
+        if self.task_id is None:
+            self.step("add_task", lambda: self.values, self.set_task_id)
+        else:
+            self.step("restore", lambda: (self.batch,))
+
+    def undo(self):
+        self.step("trash_tasks", lambda: ([self.task_id], self.batch),
+                  self.set_batch)
+
+    def set_task_id(self, task_id):
+        self.task_id = task_id
+
+
+class DeleteTasksCommand(DataCommand):
+    def __init__(self, data, task_ids, done=None, failed=None):
+        super().__init__(data, f"Esborrar {len(task_ids)} tasques", failed)
+        # 8 bytes per id
+        self.task_ids = array("q", task_ids)
+        self.done = done
+
+    def redo(self):
+        self.step("trash_tasks", lambda: (list(self.task_ids), self.batch),
+                  self.on_trashed)
+
+    def undo(self):
+        self.step("restore", lambda: (self.batch,))
+
+    def on_trashed(self, batch):
+        self.set_batch(batch)
+        if self.done is not None:
+            self.done(len(self.task_ids))
+
+
+class SetFinishedCommand(DataCommand):
+    def __init__(self, data, task_ids, finished, done=None, failed=None):
+        text = "Marcar fetes" if finished else "Marcar no fetes"
+        super().__init__(data, f"{text} {len(task_ids)} tasques", failed)
+        self.task_ids = array("q", task_ids)
+        self.finished = finished
+        # Només les que han canviat es tornen enrere
+        self.changed = array("q")
+        self.done = done
+
+    def redo(self):
+        self.step("set_finished", lambda: (list(self.task_ids),
+                                           self.finished),
+                  self.on_changed)
+
+    def undo(self):
+        self.step("set_finished", lambda: (list(self.changed),
+                                           1 - self.finished))
+
+    def on_changed(self, task_ids):
+        self.changed = array("q", task_ids)
+        if self.done is not None:
+            self.done(len(task_ids))
+
+
+class EditTaskCommand(DataCommand):
+    # Una cel·la: camp, valor anterior i valor nou
+    def __init__(self, data, module_id, task_id, field, old, new):
+        super().__init__(data, "Editar la tasca")
+        self.key = (module_id, task_id, field)
+        self.old = old
+        self.new = new
+
+    def redo(self):
+        self.step("queue_update", lambda: self.key + (self.new,))
+
+    def undo(self):
+        self.step("queue_update", lambda: self.key + (self.old,))
+
+
+class AddModuleCommand(DataCommand):
+    def __init__(self, data, name, done=None, failed=None):
+        super().__init__(data, f"Afegir el mòdul «{name}»", failed)
+        self.name = name
+        self.module_id = None
+        self.done = done
+
+    def redo(self):
+        if self.module_id is None:
+            self.step("add_module", lambda: (self.name,), self.on_added)
+        else:
+            self.step("restore", lambda: (self.batch,))
+
+    def undo(self):
+        self.step("trash_module", lambda: (self.module_id, self.batch),
+                  self.set_batch)
+
+    def on_added(self, module_id):
+        self.module_id = module_id
+        if self.done is not None:
+            self.done(module_id)
+
+
+class DeleteModuleCommand(DataCommand):
+    # Desfer torna el mòdul i totes les seues tasques d'una vegada
+    def __init__(self, data, module_id, name, done=None, failed=None):
+        super().__init__(data, f"Esborrar el mòdul «{name}»", failed)
+        self.module_id = module_id
+        self.done = done
+
+    def redo(self):
+        self.step("trash_module", lambda: (self.module_id, self.batch),
+                  self.on_trashed)
+
+    def undo(self):
+        self.step("restore", lambda: (self.batch,))
+
+    def on_trashed(self, batch):
+        self.set_batch(batch)
+        if self.done is not None:
+            self.done(batch)
+
+
+class RenameModuleCommand(QUndoCommand):
+    # El canvi de nom ja és optimista a ModuleModel.rename()
+    def __init__(self, model, module_id, old, new):
+        super().__init__(f"Canviar el nom a «{new}»")
+        self.model = model
+        self.module_id = module_id
+        self.old = old
+        self.new = new
+
+    def redo(self):
+        self.model.rename(self.module_id, self.new)
+
+    def undo(self):
+        self.model.rename(self.module_id, self.old)
@@ -0,0 +1,1378 @@
+import csv
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from json.decoder import WHITESPACE
+
+from PySide6.QtCore import Qt, Slot, QDate, QObject, QTimer, Signal
+from PySide6.QtSql import QSqlDatabase, QSqlQuery
+
+from instrument import recorder, sql_name
+
+# Capa de dades de les tasques. No depén de QtWidgets perquè la puga fer
+# servir tant l'aplicació gràfica com la línia d'ordres (cli.py).
+
+
+def default_path():
+    return os.environ.get(
+        "TASQUES_DB", os.path.join(os.path.dirname(__file__), "data.sqlite"))
+
+
+class DataError(Exception):
+    pass
+
+
+class DataBusy(DataError):
+    # Un altre procés té la base de dades bloquejada; es pot tornar a provar
+    pass
+
+
+def database_error(error):
+    # SQLITE_BUSY (5) i SQLITE_LOCKED (6), també en la forma estesa
+    code = error.nativeErrorCode()
+    if code.isdigit() and int(code) & 0xff in (5, 6):
+        return DataBusy(error.databaseText())
+    return DataError(error.databaseText())
+
+
+TASK_FIELDS = ["module", "description", "deadline", "finished"]
+
+# Taules que registra change_log, amb les columnes en l'ordre del JSON
+LOGGED_TABLES = {
+    "module": ["id", "name"],
+    "task": ["id", "module_id", "description", "deadline", "finished"],
+}
+
+
+def read_pragmas(text):
+    # "journal_mode=DELETE,busy_timeout=2000" -> {"journal_mode": "DELETE", ...}
+    pragmas = {}
+    for item in filter(None, (item.strip() for item in text.split(","))):
+        name, _, value = item.partition("=")
+        name, value = name.strip(), value.strip()
+        if not re.fullmatch(r"\w+", name) or not re.fullmatch(r"-?\w+", value):
+            raise DataError(f"PRAGMA no vàlid: '{item}'")
+        pragmas[name] = value
+    return pragmas
+
+
+def read_tasks(file, path):
+    if path.lower().endswith(".json"):
+        return read_json_array(file)
+    return csv.DictReader(file)
+
+
+def read_json_array(file, chunk_size=65536):
+    # Llig un array JSON objecte a objecte sense carregar tot el fitxer
+    decoder = json.JSONDecoder()
+    buffer = ""
+    # Els espais del principi poden ocupar més d'una lectura
+    while not buffer:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        buffer = chunk.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("El fitxer JSON ha de ser una llista de tasques")
+    buffer = buffer[1:]
+    finished = False
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            end = None
+        # Un número partit entre dues lectures també es pot llegir ("6.7"
+        # de "6.75e2"): només val si darrere ja ve la coma o el tancament
+        if end is None or (not finished and buffer[
+                WHITESPACE.match(buffer, end).end():][:1] not in (",", "]")):
+            chunk = file.read(chunk_size)
+            if not chunk:
+                if end is None:
+                    raise ValueError("El fitxer JSON està incomplet")
+                finished = True
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def write_tasks(file, path, rows):
+    count = 0
+    if path.lower().endswith(".json"):
+        file.write("[")
+        for row in rows:
+            file.write(",\n" if count else "\n")
+            file.write(json.dumps(row, ensure_ascii=False))
+            count += 1
+        file.write("\n]\n")
+    else:
+        writer = csv.DictWriter(file, fieldnames=TASK_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def parse_deadline(value, number):
+    value = str(value or "").strip()
+    date = QDate.fromString(value, Qt.ISODate)
+    if not date.isValid():
+        date = QDate.fromString(value, "dd/MM/yyyy")
+    if not date.isValid():
+        raise DataError(f"Fila {number}: data no vàlida '{value}'")
+    return date.toString(Qt.ISODate)
+
+
+def parse_finished(value):
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ("1", "true", "sí", "si") else 0
+    return 1 if value else 0
+
+
+class Data(QObject):
+    # Cada migració porta l'esquema de la versió anterior (PRAGMA
+    # user_version) a la següent. Només s'afegeixen entrades al final.
+    MIGRATIONS = [
+        "_migration_create_tables",
+        "_migration_task_indexes",
+        "_migration_iso_deadlines",
+        "_migration_search_index",
+        "_migration_pending_deadlines",
+        "_migration_trash",
+        "_migration_change_log",
+        "_migration_sort_indexes",
+        "_migration_stable_ids",
+    ]
+
+    # Avisos de canvis perquè models i memòries cau s'invaliden amb precisió
+    tasks_changed = Signal(int)
+    # Una tasca nova: mòdul, posició en l'ordre per defecte i fila
+    task_inserted = Signal(int, int, object)
+    # Posicions esborrades d'un mòdul en l'ordre per defecte, de la més
+    # alta a la més baixa
+    tasks_removed = Signal(int, object)
+    # Identificadors de totes les tasques esborrades d'una vegada
+    tasks_deleted = Signal(object)
+    task_updated = Signal(int, int, int, object)
+    # El mateix canvi de columna per a molts ids d'un mòdul
+    tasks_updated = Signal(int, object, int, object)
+    module_added = Signal(int, str)
+    module_removed = Signal(int)
+    # Comptadors fetes / total / endarrerides d'un mòdul actualitzats
+    counters_changed = Signal(int)
+    # Escriptura diferida de les edicions de cel·les
+    pending_changed = Signal(int)
+    flush_failed = Signal(str)
+
+    COLUMNS = ["id", "module_id", "description", "deadline", "finished"]
+    FLUSH_DELAY = 500
+    # El execBatch de QSQLITE copia les llistes per cada fila: lots curts
+    IMPORT_BATCH = 256
+    # Ajust de la connexió per a fitxers compartits. Es poden canviar amb
+    # el paràmetre pragmas o amb TASQUES_PRAGMAS="journal_mode=DELETE,..."
+    PRAGMAS = {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16000,
+    }
+    # Reintents quan la base de dades està ocupada: 50, 100, 200, 400 ms
+    RETRIES = 4
+    RETRY_DELAY = 0.05
+    # Fins a aquest nombre de tasques esborrades s'avisa amb les posicions;
+    # més, amb un sol tasks_changed
+    REMOVED_POSITIONS = 64
+    # Els lots de la paperera que cap sessió ha buidat en tancar es
+    # descarten passats aquests dies
+    TRASH_DAYS = 7
+    # Entrades de change_log per sobre de les quals s'esborren les més
+    # antigues en obrir (backup.py fa llavors una instantània nova)
+    CHANGE_LOG_LIMIT = 500000
+    # Columnes per les quals es poden ordenar les tasques d'un mòdul. L'id
+    # va sempre al final perquè l'ordre siga total i servisca de clau.
+    SORT_COLUMNS = ["description", "deadline", "finished"]
+    DEFAULT_ORDER = ["deadline"]
+
+    def __init__(self, path=None, connection_name=None,
+                 pragmas=None) -> None:
+        super().__init__()
+        # (task_id, camp) -> valor; l'última edició d'una cel·la guanya
+        self.pending = OrderedDict()
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(self.FLUSH_DELAY)
+        self.flush_timer.timeout.connect(self.on_flush_timeout)
+        # module_id -> [total, fetes, endarrerides]; es carreguen una vegada
+        # i després s'actualitzen amb cada escriptura
+        self.counters = None
+        self.counters_day = None
+        if connection_name is None:
+            self.connection = QSqlDatabase.addDatabase("QSQLITE")
+        else:
+            # Connexió pròpia per a un altre fil
+            self.connection = QSqlDatabase.addDatabase("QSQLITE",
+                                                       connection_name)
+        self.connection.setDatabaseName(path or default_path())
+
+        if not self.connection.open():
+            raise DataError(self.connection.lastError().databaseText())
+        settings = dict(self.PRAGMAS)
+        settings.update(read_pragmas(os.environ.get("TASQUES_PRAGMAS", "")))
+        settings.update(pragmas or {})
+        for name, value in settings.items():
+            query = QSqlQuery(self.connection)
+            if not query.exec(f"PRAGMA {name} = {value}"):
+                raise database_error(query.lastError())
+
+        if not self.migrate():
+            raise DataError(self.connection.lastError().databaseText())
+        # Les claus foranes després de migrar: refer el mòdul amb DROP TABLE
+        # esborraria en cascada totes les tasques
+        self.connection.exec("PRAGMA foreign_keys = 1")
+        try:
+            self._trim_change_log()
+        except DataBusy:
+            # Un altre procés escriu: ja es farà en la pròxima obertura
+            pass
+
+    def schema_version(self):
+        query = QSqlQuery("PRAGMA user_version", self.connection)
+        if query.next():
+            return query.value(0)
+        return 0
+
+    def migrate(self):
+        version = self.schema_version()
+        for number, name in enumerate(self.MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            # Cada pas va en la seua transacció: si falla, el fitxer es
+            # queda en la versió anterior i sense dades perdudes.
+            self.connection.transaction()
+            query = QSqlQuery(self.connection)
+            if getattr(self, name)(query) and \
+                    query.exec(f"PRAGMA user_version = {number}"):
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+                return False
+        return True
+
+    def _trim_change_log(self):
+        # Sense backup.py el registre no es buidaria mai. Normalment només
+        # és una lectura; per sobre del límit es deixa a la meitat, perquè
+        # no calga escriure en cada obertura.
+        query = self.query(
+            """
+            SELECT coalesce(max(seq) - min(seq), 0), coalesce(max(seq), 0)
+            FROM change_log
+            """)
+        query.next()
+        span, last = query.value(0), query.value(1)
+        query.finish()
+        if span < self.CHANGE_LOG_LIMIT:
+            return
+        self.query("DELETE FROM change_log WHERE seq <= ?",
+                   (last - self.CHANGE_LOG_LIMIT // 2,))
+
+    def retry(self, method, *args):
+        # Un bloqueig d'un altre procés es converteix en esperes curtes i
+        # creixents; només l'últim intent torna l'error. Per això cada
+        # mètode que escriu ho fa en una sola sentència o transacció, amb
+        # les lectures de després (posicions) abans del COMMIT.
+        delay = self.RETRY_DELAY
+        for attempt in range(self.RETRIES):
+            try:
+                return method(*args)
+            except DataBusy:
+                time.sleep(delay)
+                delay *= 2
+        return method(*args)
+
+    def commit(self):
+        if not self.connection.commit():
+            error = self.connection.lastError()
+            self.connection.rollback()
+            raise database_error(error)
+
+    def query(self, sql, values=()):
+        start = time.perf_counter_ns() if recorder.enabled else 0
+        query = QSqlQuery(self.connection)
+        query.setForwardOnly(True)
+        if not query.prepare(sql):
+            raise database_error(query.lastError())
+        for value in values:
+            query.addBindValue(value)
+        if not query.exec():
+            raise database_error(query.lastError())
+        if start:
+            recorder.span("sql", sql_name(sql), start)
+        return query
+
+    def count_tasks(self, module_id):
+        self.flush()
+        query = self.query(
+            "SELECT count(*) FROM task WHERE module_id = ?", (module_id,))
+        query.next()
+        return query.value(0)
+
+    def _order(self, order, descending):
+        # (columnes de la clau, ORDER BY, clau com a valor de fila i
+        # operador de "després de"). Totes les columnes van en la mateixa
+        # direcció perquè un índex (module_id, ...) les recorrega d'una
+        # passada, cap avant o cap arrere.
+        order = list(order or self.DEFAULT_ORDER)
+        if len(set(order)) != len(order) or \
+                not set(order) <= set(self.SORT_COLUMNS):
+            raise DataError(f"Ordre no vàlid: {order}")
+        columns = order + ["id"]
+        direction = " DESC" if descending else ""
+        return (columns,
+                ", ".join(column + direction for column in columns),
+                f"({', '.join(columns)})",
+                "<" if descending else ">")
+
+    def task_page(self, module_id, after, limit, offset=0, order=None,
+                  descending=False):
+        # Paginació per clau: continua després de la clau de l'ordre (les
+        # columnes i l'id de l'última fila) sense OFFSET
+        self.flush()
+        columns, order_by, key, later = self._order(order, descending)
+        if after is None and offset > 0:
+            # Salt directe a una pàgina encara no recorreguda
+            after = self.task_key_at(module_id, offset - 1, order, descending)
+            if after is None:
+                return []
+        if after is None:
+            query = self.query(
+                f"""
+                SELECT id, module_id, description, deadline, finished
+                FROM task WHERE module_id = ?
+                ORDER BY {order_by} LIMIT ?
+                """, (module_id, limit))
+        else:
+            query = self.query(
+                f"""
+                SELECT id, module_id, description, deadline, finished
+                FROM task
+                WHERE module_id = ?
+                  AND {key} {later} ({", ".join("?" * len(columns))})
+                ORDER BY {order_by} LIMIT ?
+                """, (module_id, *after, limit))
+        rows = []
+        while query.next():
+            rows.append((query.value(0), query.value(1), query.value(2),
+                         query.value(3), query.value(4)))
+        return rows
+
+    def task_descriptions(self, module_id, order=None, descending=False):
+        # Descripcions de tot el mòdul en l'ordre de task_page()
+        self.flush()
+        _, order_by, _, _ = self._order(order, descending)
+        query = self.query(
+            f"""
+            SELECT description FROM task WHERE module_id = ?
+            ORDER BY {order_by}
+            """, (module_id,))
+        descriptions = []
+        while query.next():
+            descriptions.append(query.value(0))
+        return descriptions
+
+    def task_ids(self, module_id, order=None, descending=False):
+        # Identificadors de tot el mòdul en l'ordre de task_page()
+        self.flush()
+        _, order_by, _, _ = self._order(order, descending)
+        query = self.query(
+            f"SELECT id FROM task WHERE module_id = ? ORDER BY {order_by}",
+            (module_id,))
+        ids = []
+        while query.next():
+            ids.append(query.value(0))
+        return ids
+
+    def add_task(self, module_id, description, deadline, finished=0):
+        # Tot en una transacció i els comptadors després: si falla, no
+        # queda res fet i retry() la pot repetir sense duplicar la tasca
+        self.flush()
+        self.connection.transaction()
+        try:
+            query = self.query(
+                """
+                INSERT INTO task (module_id, description, deadline, finished)
+                VALUES (?, ?, ?, ?)
+                """, (module_id, description, deadline, finished))
+            task_id = query.lastInsertId()
+            # Amb la posició, els models inserten la fila sense tornar a
+            # llegir
+            position = self.task_position(module_id, task_id)
+        except DataError:
+            self.connection.rollback()
+            raise
+        self.commit()
+        self._count(module_id, deadline, finished, 1)
+        self.task_inserted.emit(
+            module_id, position,
+            (task_id, module_id, description, deadline, finished))
+        return task_id
+
+    def queue_update(self, module_id, task_id, field, value):
+        # Es mostra de seguida però s'escriu en el proper flush()
+        if field not in ("description", "deadline", "finished"):
+            raise DataError(f"Camp desconegut: {field}")
+        self._recount(task_id, field, value)
+        self.pending[(task_id, field)] = value
+        self.pending.move_to_end((task_id, field))
+        self.pending_changed.emit(len(self.pending))
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+        self.task_updated.emit(module_id, task_id,
+                               self.COLUMNS.index(field), value)
+
+    def flush(self):
+        # Totes les edicions pendents en una sola transacció
+        if not self.pending:
+            return
+        self.flush_timer.stop()
+        by_field = {}
+        for (task_id, field), value in self.pending.items():
+            values, ids = by_field.setdefault(field, ([], []))
+            values.append(value)
+            ids.append(task_id)
+
+        start = time.perf_counter_ns() if recorder.enabled else 0
+        self.connection.transaction()
+        query = QSqlQuery(self.connection)
+        for field, (values, ids) in by_field.items():
+            query.prepare(f"UPDATE task SET {field} = ? WHERE id = ?")
+            query.addBindValue(values)
+            query.addBindValue(ids)
+            if not query.execBatch():
+                error = query.lastError()
+                self.connection.rollback()
+                raise database_error(error)
+        self.commit()
+        if start:
+            recorder.span("sql", "flush", start, {"rows": len(self.pending)})
+        self.pending.clear()
+        self.pending_changed.emit(0)
+
+    def discard(self):
+        # Oblida les edicions pendents sense escriure-les
+        self.flush_timer.stop()
+        self.pending.clear()
+        self.pending_changed.emit(0)
+
+    @Slot()
+    def on_flush_timeout(self):
+        try:
+            self.retry(self.flush)
+        except DataError as error:
+            self.flush_failed.emit(str(error))
+
+    def module_counters(self, module_id):
+        today = QDate.currentDate().toString(Qt.ISODate)
+        if self.counters is None or self.counters_day != today:
+            # Primera consulta o canvi de dia: un sol recompte de tot
+            self._load_counters(today)
+        return self.counters.get(module_id, (0, 0, 0))
+
+    def all_counters(self):
+        # Còpia de tots els comptadors i el dia amb què s'han calculat
+        self.module_counters(None)
+        return self.counters_day, {module_id: tuple(values) for
+                                   module_id, values in self.counters.items()}
+
+    def _load_counters(self, today):
+        self.flush()
+        query = self.query(
+            """
+            SELECT module_id, count(*), sum(finished),
+                   sum(finished = 0 AND deadline < ?)
+            FROM task GROUP BY module_id
+            """, (today,))
+        self.counters = {}
+        self.counters_day = today
+        while query.next():
+            self.counters[query.value(0)] = [query.value(1), query.value(2),
+                                             query.value(3)]
+
+    def _count(self, module_id, deadline, finished, sign, counters=None):
+        if counters is None:
+            if self.counters is None:
+                return
+            counters = self.counters
+        values = counters.setdefault(module_id, [0, 0, 0])
+        values[0] += sign
+        if finished:
+            values[1] += sign
+        elif deadline < self.counters_day:
+            values[2] += sign
+        if counters is self.counters:
+            self.counters_changed.emit(module_id)
+
+    def _merge_counters(self, counters):
+        # Suma uns comptadors parcials amb un sol avís per mòdul
+        for module_id, values in counters.items():
+            total = self.counters.setdefault(module_id, [0, 0, 0])
+            for column, value in enumerate(values):
+                total[column] += value
+            self.counters_changed.emit(module_id)
+
+    def _recount(self, task_id, field, value):
+        # Resta l'estat anterior de la tasca i suma el nou
+        if self.counters is None or field == "description":
+            return
+        query = self.query(
+            "SELECT module_id, deadline, finished FROM task WHERE id = ?",
+            (task_id,))
+        if not query.next():
+            return
+        module_id = query.value(0)
+        deadline = self.pending.get((task_id, "deadline"), query.value(1))
+        finished = self.pending.get((task_id, "finished"), query.value(2))
+        self._count(module_id, deadline, finished, -1)
+        if field == "deadline":
+            deadline = value
+        else:
+            finished = value
+        self._count(module_id, deadline, finished, 1)
+
+    def import_tasks(self, path):
+        # Lectura en streaming i inserció per lots en una sola transacció
+        modules = {}
+        query = self.query("SELECT id, name FROM module")
+        while query.next():
+            modules[query.value(1)] = query.value(0)
+
+        insert_module = QSqlQuery(self.connection)
+        insert_module.prepare("INSERT INTO module (name) VALUES (?)")
+        insert_task = QSqlQuery(self.connection)
+        insert_task.prepare(
+            """
+            INSERT INTO task (module_id, description, deadline, finished)
+            VALUES (?, ?, ?, ?)
+            """
+        )
+
+        imported = 0
+        added = []
+        changed = set()
+        counters = {}
+        batch = ([], [], [], [])
+        self.flush()
+        self.connection.transaction()
+        try:
+            with open(path, newline="", encoding="utf-8") as file:
+                for number, item in enumerate(read_tasks(file, path), 1):
+                    if not isinstance(item, dict):
+                        raise DataError(f"Fila {number}: no és una tasca")
+                    # null en JSON és el mateix que un camp que no hi és
+                    name = str(item.get("module") or "").strip()
+                    if not name:
+                        raise DataError(f"Fila {number}: falta el mòdul")
+                    if name not in modules:
+                        insert_module.addBindValue(name)
+                        if not insert_module.exec():
+                            raise database_error(insert_module.lastError())
+                        modules[name] = insert_module.lastInsertId()
+                        added.append((modules[name], name))
+                    module_id = modules[name]
+                    changed.add(module_id)
+                    batch[0].append(module_id)
+                    description = item.get("description")
+                    batch[1].append("" if description is None
+                                    else str(description))
+                    batch[2].append(parse_deadline(item.get("deadline"),
+                                                   number))
+                    batch[3].append(parse_finished(item.get("finished")))
+                    if self.counters is not None:
+                        self._count(module_id, batch[2][-1], batch[3][-1], 1,
+                                    counters)
+                    if len(batch[0]) >= self.IMPORT_BATCH:
+                        imported += self._insert_batch(insert_task, batch)
+                imported += self._insert_batch(insert_task, batch)
+        except DataError:
+            self.connection.rollback()
+            raise
+        except (OSError, ValueError) as error:
+            self.connection.rollback()
+            raise DataError(str(error))
+        except BaseException:
+            # Cap error deixa la transacció oberta
+            self.connection.rollback()
+            raise
+        self.commit()
+        # Els mòduls nous abans que els seus comptadors i tasques
+        for module_id, name in added:
+            self.module_added.emit(module_id, name)
+        self._merge_counters(counters)
+        for module_id in changed:
+            self.tasks_changed.emit(module_id)
+        return imported
+
+    def _insert_batch(self, query, batch):
+        count = len(batch[0])
+        if not count:
+            return 0
+        start = time.perf_counter_ns() if recorder.enabled else 0
+        for column in batch:
+            query.addBindValue(list(column))
+        if not query.execBatch():
+            raise database_error(query.lastError())
+        if start:
+            recorder.span("sql", "import batch", start, {"rows": count})
+        for column in batch:
+            column.clear()
+        return count
+
+    def export_tasks(self, path, module_id=None):
+        # Cursor endavant: la memòria no creix amb el nombre de files
+        self.flush()
+        sql = """
+            SELECT module.name, task.description, task.deadline, task.finished
+            FROM task JOIN module ON module.id = task.module_id
+            """
+        if module_id is None:
+            query = self.query(sql + " ORDER BY task.module_id, "
+                               "task.deadline, task.id")
+        else:
+            query = self.query(sql + " WHERE task.module_id = ? "
+                               "ORDER BY task.deadline, task.id",
+                               (module_id,))
+
+        def rows():
+            while query.next():
+                yield {
+                    "module": query.value(0),
+                    "description": query.value(1),
+                    "deadline": query.value(2),
+                    "finished": query.value(3),
+                }
+
+        try:
+            with open(path, "w", newline="", encoding="utf-8") as file:
+                return write_tasks(file, path, rows())
+        except OSError as error:
+            raise DataError(str(error))
+
+    def modules(self):
+        query = self.query("SELECT id, name FROM module ORDER BY id")
+        modules = []
+        while query.next():
+            modules.append((query.value(0), query.value(1)))
+        return modules
+
+    def add_module(self, name):
+        query = self.query("INSERT INTO module (name) VALUES (?)", (name,))
+        module_id = query.lastInsertId()
+        self.module_added.emit(module_id, name)
+        return module_id
+
+    def rename_module(self, module_id, name):
+        self.query("UPDATE module SET name = ? WHERE id = ?", (name, module_id))
+
+    def search(self, text, limit=50):
+        # Cada paraula es busca com a prefix: "exer fil" troba "Exercici fils"
+        words = re.findall(r"\w+", text)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"*' for word in words)
+        self.flush()
+        query = self.query(
+            """
+            SELECT task.id, task.module_id, module.name, task.description,
+                   task.deadline
+            FROM task_fts
+            JOIN task ON task.id = task_fts.rowid
+            JOIN module ON module.id = task.module_id
+            WHERE task_fts MATCH ?
+            LIMIT ?
+            """, (match, limit))
+        results = []
+        while query.next():
+            results.append((query.value(0), query.value(1), query.value(2),
+                            query.value(3), query.value(4)))
+        return results
+
+    def task_key_at(self, module_id, offset, order=None, descending=False):
+        columns, order_by, _, _ = self._order(order, descending)
+        query = self.query(
+            f"""
+            SELECT {", ".join(columns)} FROM task WHERE module_id = ?
+            ORDER BY {order_by} LIMIT 1 OFFSET ?
+            """, (module_id, offset))
+        if query.next():
+            return tuple(query.value(column) for column in range(len(columns)))
+        return None
+
+    def task_position(self, module_id, task_id, order=None,
+                      descending=False):
+        positions = self.task_positions(module_id, [task_id], order,
+                                        descending)
+        return positions.get(task_id)
+
+    def task_positions(self, module_id, task_ids, order=None,
+                       descending=False):
+        # task_id -> posició en l'ordre donat. Poques tasques es compten
+        # una a una per l'índex; moltes, numerant el mòdul d'una passada.
+        # El + deixa module_id com a filtre: les tasques es busquen per id
+        # i no recorrent el mòdul sencer per task_module_deadline.
+        self.flush()
+        columns, order_by, key, later = self._order(order, descending)
+        if len(task_ids) <= self.REMOVED_POSITIONS:
+            target = ", ".join(f"target.{column}" for column in columns)
+            query = self.query(
+                f"""
+                SELECT target.id, (
+                    SELECT count(*) FROM task
+                    WHERE module_id = target.module_id
+                      AND ({target}) {later} {key}
+                )
+                FROM task AS target
+                WHERE target.id IN (SELECT value FROM json_each(?))
+                  AND +target.module_id = ?
+                """, (json.dumps(list(task_ids)), module_id))
+        else:
+            query = self.query(
+                f"""
+                SELECT id, position FROM (
+                    SELECT id, row_number() OVER (ORDER BY {order_by}) - 1
+                        AS position
+                    FROM task WHERE module_id = ?
+                )
+                WHERE id IN (SELECT value FROM json_each(?))
+                """, (module_id, json.dumps(list(task_ids))))
+        positions = {}
+        while query.next():
+            positions[query.value(0)] = query.value(1)
+        return positions
+
+    def module_id(self, name):
+        query = self.query("SELECT id FROM module WHERE name = ?", (name,))
+        if not query.next():
+            raise DataError(f"No existeix el mòdul {name}")
+        return query.value(0)
+
+    def iter_tasks(self, module_id=None, pending=False, overdue=False):
+        # Generador sobre un cursor endavant, ordenat per data
+        self.flush()
+        conditions = []
+        values = []
+        if module_id is not None:
+            conditions.append("task.module_id = ?")
+            values.append(module_id)
+        if pending or overdue:
+            conditions.append("task.finished = 0")
+        if overdue:
+            conditions.append("task.deadline < date('now', 'localtime')")
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        query = self.query(
+            f"""
+            SELECT task.id, module.name, task.description, task.deadline,
+                   task.finished
+            FROM task JOIN module ON module.id = task.module_id
+            {where}
+            ORDER BY task.deadline, task.id
+            """, values)
+        while query.next():
+            yield (query.value(0), query.value(1), query.value(2),
+                   query.value(3), query.value(4))
+
+    def set_finished(self, task_ids, finished=1):
+        # Una sola sentència per a tot el conjunt d'identificadors. Torna
+        # els ids que han canviat, que són els que cal tornar enrere per
+        # a desfer-ho.
+        task_ids = list(task_ids)
+        if not task_ids:
+            return []
+        self.flush()
+        # Només es toquen les que canvien, així l'estat anterior és l'oposat
+        query = self.query(
+            """
+            UPDATE task SET finished = ?
+            WHERE id IN (SELECT value FROM json_each(?)) AND finished != ?
+            RETURNING id, module_id, deadline
+            """, (finished, json.dumps(task_ids), finished))
+        updated = {}
+        counters = {}
+        while query.next():
+            module_id = query.value(1)
+            updated.setdefault(module_id, []).append(query.value(0))
+            if self.counters is not None:
+                deadline = query.value(2)
+                self._count(module_id, deadline, 1 - finished, -1, counters)
+                self._count(module_id, deadline, finished, 1, counters)
+        query.finish()
+        if self.counters is not None:
+            self._merge_counters(counters)
+        column = self.COLUMNS.index("finished")
+        for module_id, ids in updated.items():
+            self.tasks_updated.emit(module_id, ids, column, finished)
+        return [task_id for ids in updated.values() for task_id in ids]
+
+    def delete_tasks(self, task_ids):
+        # Tota la selecció en una sola sentència DELETE
+        return len(self._delete_tasks(task_ids)[0])
+
+    def trash_tasks(self, task_ids, batch=None):
+        # Com delete_tasks(), però abans es copien les files a la paperera.
+        # Torna el lot, que restore() torna a posar en una transacció.
+        return self._delete_tasks(task_ids, True, batch)[1]
+
+    def _delete_tasks(self, task_ids, trash=False, batch=None):
+        task_ids = list(task_ids)
+        if not task_ids:
+            return [], batch
+        self.flush()
+        changed = set()
+        counters = {}
+        positions = {}
+        deleted_ids = []
+        self.connection.transaction()
+        try:
+            if trash:
+                batch = self._trash_batch(batch)
+                self.query(
+                    """
+                    INSERT INTO trash (batch, kind, row)
+                    SELECT ?, 'task', json_array(id, module_id, description,
+                                                 deadline, finished)
+                    FROM task WHERE id IN (SELECT value FROM json_each(?))
+                    """, (batch, json.dumps(task_ids)))
+            if len(task_ids) <= self.REMOVED_POSITIONS:
+                # Posicions d'abans d'esborrar, per treure les files del model
+                columns, _, key, _ = self._order(None, False)
+                target = ", ".join(f"target.{column}" for column in columns)
+                query = self.query(
+                    f"""
+                    SELECT target.module_id, (
+                        SELECT count(*) FROM task
+                        WHERE module_id = target.module_id
+                          AND {key} < ({target})
+                    )
+                    FROM task AS target
+                    WHERE target.id IN (SELECT value FROM json_each(?))
+                    """, (json.dumps(task_ids),))
+                while query.next():
+                    positions.setdefault(query.value(0), []).append(
+                        query.value(1))
+                query.finish()
+            query = self.query(
+                """
+                DELETE FROM task WHERE id IN (SELECT value FROM json_each(?))
+                RETURNING module_id, deadline, finished, id
+                """, (json.dumps(task_ids),))
+            while query.next():
+                module_id = query.value(0)
+                changed.add(module_id)
+                deleted_ids.append(query.value(3))
+                if self.counters is not None:
+                    self._count(module_id, query.value(1), query.value(2), -1,
+                                counters)
+            query.finish()
+        except DataError:
+            self.connection.rollback()
+            raise
+        self.commit()
+        if self.counters is not None:
+            self._merge_counters(counters)
+        if deleted_ids:
+            self.tasks_deleted.emit(deleted_ids)
+        for module_id in changed:
+            if module_id in positions:
+                self.tasks_removed.emit(
+                    module_id, sorted(positions[module_id], reverse=True))
+            else:
+                self.tasks_changed.emit(module_id)
+        return deleted_ids, batch
+
+    def trash_module(self, module_id, batch=None):
+        # Esborra el mòdul (les tasques van amb ON DELETE CASCADE) després
+        # de copiar-lo a la paperera amb les seues tasques amb dos
+        # INSERT ... SELECT. Torna el lot.
+        self.flush()
+        self.connection.transaction()
+        try:
+            batch = self._trash_batch(batch)
+            for sql in (
+                    """
+                    INSERT INTO trash (batch, kind, row)
+                    SELECT ?, 'module', json_array(id, name)
+                    FROM module WHERE id = ?
+                    """,
+                    """
+                    INSERT INTO trash (batch, kind, row)
+                    SELECT ?, 'task', json_array(id, module_id, description,
+                                                 deadline, finished)
+                    FROM task WHERE module_id = ?
+                    """):
+                self.query(sql, (batch, module_id))
+            self.query("DELETE FROM module WHERE id = ?", (module_id,))
+        except DataError:
+            self.connection.rollback()
+            raise
+        self.commit()
+        if self.counters is not None:
+            self.counters.pop(module_id, None)
+        self.module_removed.emit(module_id)
+        return batch
+
+    def restore(self, batch):
+        # Torna a inserir un lot de la paperera amb els mateixos ids, tot en
+        # una transacció: primer els mòduls, després les tasques
+        self.flush()
+        modules = []
+        rows = []
+        changed = set()
+        counters = {}
+        count = 0
+        self.connection.transaction()
+        try:
+            # Un lot buidat no es pot tornar: millor un error que desfer
+            # sense tornar res
+            query = self.query("SELECT 1 FROM trash_batch WHERE id = ?",
+                               (batch,))
+            if not query.next():
+                raise DataError("Les dades esborrades ja no són a la "
+                                "paperera i no es poden recuperar")
+            query.finish()
+            query = self.query(
+                """
+                INSERT INTO module (id, name)
+                SELECT json_extract(row, '$[0]'), json_extract(row, '$[1]')
+                FROM trash WHERE batch = ? AND kind = 'module'
+                RETURNING id, name
+                """, (batch,))
+            while query.next():
+                modules.append((query.value(0), query.value(1)))
+            query.finish()
+            # Comptadors per mòdul i, si són poques, les files per al model,
+            # sense fer passar cada tasca per Python
+            query = self.query(
+                """
+                SELECT json_extract(row, '$[1]') AS module_id, count(*),
+                       sum(json_extract(row, '$[4]')),
+                       sum(json_extract(row, '$[4]') = 0
+                           AND json_extract(row, '$[3]') < ?)
+                FROM trash WHERE batch = ? AND kind = 'task'
+                GROUP BY module_id
+                """, (self.counters_day or "", batch))
+            while query.next():
+                module_id = query.value(0)
+                count += query.value(1)
+                changed.add(module_id)
+                counters[module_id] = [query.value(1), query.value(2),
+                                       query.value(3)]
+            query.finish()
+            if count <= self.REMOVED_POSITIONS:
+                query = self.query(
+                    """
+                    SELECT json_extract(row, '$[0]'), json_extract(row, '$[1]'),
+                           json_extract(row, '$[2]'), json_extract(row, '$[3]'),
+                           json_extract(row, '$[4]')
+                    FROM trash WHERE batch = ? AND kind = 'task'
+                    """, (batch,))
+                while query.next():
+                    rows.append(tuple(query.value(column)
+                                      for column in range(5)))
+                query.finish()
+            self.query(
+                """
+                INSERT INTO task (id, module_id, description, deadline,
+                                  finished)
+                SELECT json_extract(row, '$[0]'), json_extract(row, '$[1]'),
+                       json_extract(row, '$[2]'), json_extract(row, '$[3]'),
+                       json_extract(row, '$[4]')
+                FROM trash WHERE batch = ? AND kind = 'task'
+                """, (batch,))
+            self.query("DELETE FROM trash WHERE batch = ?", (batch,))
+            # Les posicions abans del COMMIT: després el lot ja no hi és i
+            # retry() no podria tornar a començar
+            inserted = sorted(
+                (self.task_position(row[1], row[0]), row) for row in rows)
+        except DataError:
+            self.connection.rollback()
+            raise
+        self.commit()
+        for module_id, name in modules:
+            self.module_added.emit(module_id, name)
+        if self.counters is not None:
+            self._merge_counters(counters)
+        restored = {module_id for module_id, _ in modules}
+        if count <= self.REMOVED_POSITIONS:
+            # Poques tasques: s'insereixen al model en l'ordre de la vista,
+            # cadascuna a la seua posició final
+            for position, row in inserted:
+                if row[1] not in restored:
+                    self.task_inserted.emit(row[1], position, row)
+        else:
+            for module_id in changed - restored:
+                self.tasks_changed.emit(module_id)
+        return count
+
+    def purge_trash(self, batches):
+        # Buida els lots que ja no pot desfer cap ordre
+        self.query(
+            """
+            DELETE FROM trash_batch
+            WHERE id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(list(batches)),))
+
+    def empty_trash(self):
+        # Tots els lots, de totes les sessions: només per a sync.py en
+        # arrencar, quan encara no hi ha cap client
+        self.query("DELETE FROM trash_batch")
+
+    def expire_trash(self):
+        # Lots que cap sessió ha buidat (s'ha tancat malament o continua
+        # oberta). Altres finestres sobre el mateix fitxer encara poden
+        # desfer els recents, així que només s'esborren els antics.
+        self.query(
+            "DELETE FROM trash_batch WHERE created < datetime('now', ?)",
+            (f"-{self.TRASH_DAYS} days",))
+
+    def _trash_batch(self, batch):
+        if batch is not None:
+            return batch
+        query = self.query("INSERT INTO trash_batch DEFAULT VALUES")
+        return query.lastInsertId()
+
+    def pending_deadlines(self, first, last):
+        # Tasques no fetes amb el termini entre dues dates (incloses). Va
+        # per l'índex parcial task_pending_deadline, sense recórrer la taula
+        self.flush()
+        query = self.query(
+            """
+            SELECT id, module_id, description, deadline FROM task
+            WHERE finished = 0 AND deadline BETWEEN ? AND ?
+            """, (first, last))
+        return self._deadline_rows(query)
+
+    def pending_tasks(self, task_ids):
+        # Les mateixes dades que pending_deadlines() per a uns ids concrets
+        self.flush()
+        query = self.query(
+            """
+            SELECT id, module_id, description, deadline FROM task
+            WHERE id IN (SELECT value FROM json_each(?)) AND finished = 0
+            """, (json.dumps(list(task_ids)),))
+        return self._deadline_rows(query)
+
+    def _deadline_rows(self, query):
+        rows = []
+        while query.next():
+            rows.append((query.value(0), query.value(1), query.value(2),
+                         query.value(3)))
+        return rows
+
+    def stats(self):
+        self.flush()
+        query = self.query(
+            """
+            SELECT module.name, count(task.id),
+                   coalesce(sum(task.finished), 0),
+                   coalesce(sum(task.finished = 0 AND
+                                task.deadline < date('now', 'localtime')), 0)
+            FROM module LEFT JOIN task ON task.module_id = module.id
+            GROUP BY module.id
+            ORDER BY module.id
+            """)
+        result = []
+        while query.next():
+            result.append((query.value(0), query.value(1), query.value(2),
+                           query.value(3)))
+        return result
+
+    def _migration_create_tables(self, query):
+        query.exec(
+            "SELECT count(*) FROM sqlite_master WHERE name = 'module'")
+        query.next()
+        new_database = query.value(0) == 0
+
+        module_table_created = query.exec(
+            """
+            CREATE TABLE IF NOT EXISTS module (
+            id INTEGER PRIMARY KEY ASC,
+            name TEXT NOT NULL UNIQUE);
+            """
+        )
+        task_table_created = query.exec(
+            """
+            CREATE TABLE IF NOT EXISTS task (
+            id INTEGER PRIMARY KEY ASC,
+            module_id integer NOT NULL,
+            description TEXT NOT NULL,
+            deadline TEXT NOT NULL,
+            finished INTEGER NOT NULL,
+            CONSTRAINT fk_module
+                FOREIGN KEY (module_id)
+                REFERENCES module (id)
+                ON DELETE CASCADE);
+            """
+        )
+        if not (module_table_created and task_table_created):
+            return False
+        if new_database:
+            return self._seed(query)
+        return True
+
+    def _migration_task_indexes(self, query):
+        # Filtre per mòdul de la vista i esborrat en cascada de del_module
+        return query.exec(
+            """
+            CREATE INDEX IF NOT EXISTS task_module_finished_deadline
+            ON task (module_id, finished, deadline);
+            """
+        )
+
+    def _migration_iso_deadlines(self, query):
+        # dd/MM/yyyy -> yyyy-MM-dd, que SQLite pot ordenar i filtrar per rang
+        converted = query.exec(
+            """
+            UPDATE task
+            SET deadline = substr(deadline, 7, 4) || '-' ||
+                           substr(deadline, 4, 2) || '-' ||
+                           substr(deadline, 1, 2)
+            WHERE deadline GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]';
+            """
+        )
+        return converted and query.exec(
+            """
+            CREATE INDEX IF NOT EXISTS task_module_deadline
+            ON task (module_id, deadline);
+            """
+        )
+
+    def _migration_search_index(self, query):
+        # Índex de text complet sobre task.description, mantingut per triggers
+        statements = [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5 (
+                description,
+                content = 'task',
+                content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3');
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS task_fts_insert
+            AFTER INSERT ON task BEGIN
+                INSERT INTO task_fts (rowid, description)
+                VALUES (new.id, new.description);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS task_fts_delete
+            AFTER DELETE ON task BEGIN
+                INSERT INTO task_fts (task_fts, rowid, description)
+                VALUES ('delete', old.id, old.description);
+            END;
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS task_fts_update
+            AFTER UPDATE OF description ON task BEGIN
+                INSERT INTO task_fts (task_fts, rowid, description)
+                VALUES ('delete', old.id, old.description);
+                INSERT INTO task_fts (rowid, description)
+                VALUES (new.id, new.description);
+            END;
+            """,
+            "INSERT INTO task_fts (task_fts) VALUES ('rebuild');",
+        ]
+        return all(query.exec(statement) for statement in statements)
+
+    def _migration_pending_deadlines(self, query):
+        # Només les tasques no fetes, ordenades per termini, per als avisos
+        return query.exec(
+            """
+            CREATE INDEX IF NOT EXISTS task_pending_deadline
+            ON task (deadline) WHERE finished = 0;
+            """
+        )
+
+    def _migration_trash(self, query):
+        # Paperera per a desfer esborrats: cada fila és un JSON amb les
+        # columnes de la taula d'origen, agrupades per lot. AUTOINCREMENT
+        # perquè un lot buidat no es torne a fer servir.
+        statements = [
+            """
+            CREATE TABLE IF NOT EXISTS trash_batch (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS trash (
+                batch INTEGER NOT NULL
+                    REFERENCES trash_batch(id) ON DELETE CASCADE,
+                kind TEXT NOT NULL,
+                row TEXT NOT NULL
+            );
+            """,
+            "CREATE INDEX IF NOT EXISTS trash_batch_rows ON trash (batch);",
+        ]
+        return all(query.exec(statement) for statement in statements)
+
+    def _migration_change_log(self, query):
+        # Registre de canvis per a les còpies incrementals de backup.py: una
+        # entrada per fila inserida o modificada, amb les columnes noves, o
+        # esborrada, amb row a NULL. Les files que ja hi havia les porta la
+        # primera instantània.
+        statements = [
+            """
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                row TEXT
+            );
+            """,
+        ]
+        for table, columns in LOGGED_TABLES.items():
+            row = "json_array({})".format(
+                ", ".join(f"new.{column}" for column in columns))
+            # Un UPDATE que deixa la fila igual no es registra
+            changed = " OR ".join(f"old.{column} IS NOT new.{column}"
+                                  for column in columns)
+            for event, record, values, when in (
+                    ("INSERT", "new", row, ""),
+                    ("UPDATE", "new", row, f"WHEN {changed}"),
+                    ("DELETE", "old", "NULL", "")):
+                statements.append(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_log_{event.lower()}
+                    AFTER {event} ON {table} {when} BEGIN
+                        INSERT INTO change_log (tbl, row_id, row)
+                        VALUES ('{table}', {record}.id, {values});
+                    END;
+                    """)
+        return all(query.exec(statement) for statement in statements)
+
+    def _migration_sort_indexes(self, query):
+        # Un índex per cada ordre de la vista de tasques (task_page): la
+        # columna de la capçalera i el segon criteri, deadline o
+        # description. Els de deadline sol i finished, deadline ja hi són.
+        statements = [
+            """
+            CREATE INDEX IF NOT EXISTS task_module_deadline_description
+            ON task (module_id, deadline, description);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS task_module_description_deadline
+            ON task (module_id, description, deadline);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS task_module_finished_description
+            ON task (module_id, finished, description);
+            """,
+        ]
+        return all(query.exec(statement) for statement in statements)
+
+    def _migration_stable_ids(self, query):
+        # module i task amb AUTOINCREMENT: sense, un mòdul o una tasca nous
+        # poden agafar l'id d'una fila de la paperera i restore() ja no la
+        # podria tornar. SQLite no ho permet amb ALTER TABLE, així que es
+        # refan les taules i després els índexs i triggers que s'hi perden.
+        statements = [
+            """
+            CREATE TABLE module_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE);
+            """,
+            """
+            CREATE TABLE task_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            module_id integer NOT NULL,
+            description TEXT NOT NULL,
+            deadline TEXT NOT NULL,
+            finished INTEGER NOT NULL,
+            CONSTRAINT fk_module
+                FOREIGN KEY (module_id)
+                REFERENCES module (id)
+                ON DELETE CASCADE);
+            """,
+            "INSERT INTO module_new SELECT id, name FROM module;",
+            """
+            INSERT INTO task_new
+            SELECT id, module_id, description, deadline, finished FROM task;
+            """,
+            "DROP TABLE task;",
+            "DROP TABLE module;",
+            "ALTER TABLE module_new RENAME TO module;",
+            "ALTER TABLE task_new RENAME TO task;",
+        ]
+        # Els ids que ja són a la paperera tampoc es tornen a donar. La
+        # còpia ja ha deixat una entrada amb el màxim de la taula.
+        for table in ("module", "task"):
+            statements.append(
+                f"DELETE FROM sqlite_sequence WHERE name = '{table}';")
+            statements.append(
+                f"""
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT '{table}', max(coalesce((SELECT max(id) FROM {table}), 0),
+                                      coalesce(max(json_extract(row, '$[0]')), 0))
+                FROM trash WHERE kind = '{table}';
+                """)
+        if not all(query.exec(statement) for statement in statements):
+            return False
+        return all(getattr(self, name)(query) for name in (
+            "_migration_task_indexes",
+            "_migration_iso_deadlines",
+            "_migration_search_index",
+            "_migration_pending_deadlines",
+            "_migration_change_log",
+            "_migration_sort_indexes",
+        ))
+
+    def _seed(self, query):
+        # Estil OBDC
+        prepared = query.prepare(
+            """
+            INSERT INTO module (
+                name
+            )
+            VALUES (?)
+            """
+        )
+
+        if prepared:
+            data = ["DI", "AD", "PMDM", "PSP", "SGE",
+                    "EIE", "ANG-II", "PROJECTE", "FCT"]
+            # Inserció per lots amb execBatch
+            query.addBindValue(data)
+            if not query.execBatch():
+                return False
+
+        # Estil OBDC
+        prepared = query.prepare(
+            """
+            INSERT INTO task (
+                module_id,
+                description,
+                deadline,
+                finished
+            )
+            VALUES (?, ?, ?, ?)
+            """
+        )
+
+        if prepared:
+            data = [
+                ("1", "Tasca de prova 1", "2023-01-23", 0),
+                ("1", "Tasca de prova 2", "2023-01-23", 1),
+                ("2", "Tasca de prova 3", "2023-01-23", 1)
+            ]
+            # Inserció per lots amb execBatch, una llista per columna
+            for column in zip(*data):
+                query.addBindValue(list(column))
+            if not query.execBatch():
+                return False
+        return prepared
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Instrumentació opcional: temps de SQL, peticions al fil de dades,
+# reinicis de models i pintats de les vistes. S'activa amb
+# TASQUES_TRACE=1 (o TASQUES_TRACE=fitxer.json per desar la traça en
+# eixir) o des del menú. Desactivada, cada punt de mesura només mira
+# recorder.enabled.
+
+
+class Recorder():
+    # Esdeveniments en format "trace event" de Chrome (chrome://tracing o
+    # Perfetto) i resum per (categoria, nom) per al panell d'estadístiques
+    MAX_EVENTS = 500000
+
+    def __init__(self):
+        self.enabled = False
+        self.events = deque(maxlen=self.MAX_EVENTS)
+        self.stats = {}
+        self.threads = {}
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter_ns()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.stats.clear()
+
+    def name_thread(self, name):
+        self.threads[threading.get_ident()] = name
+
+    def span(self, category, name, start, args=None):
+        # start: time.perf_counter_ns() a l'inici de l'operació
+        end = time.perf_counter_ns()
+        event = {
+            "name": name, "cat": category, "ph": "X",
+            "ts": (start - self.origin) / 1000,
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+            values = self.stats.setdefault((category, name), [0, 0, 0])
+            values[0] += 1
+            values[1] += end - start
+            values[2] = max(values[2], end - start)
+
+    def watch_model(self, model, name):
+        # Cada reinici del model, des de modelAboutToBeReset fins que les
+        # vistes connectades abans han acabat amb modelReset
+        starts = []
+
+        def about_to_reset():
+            if self.enabled:
+                starts.append(time.perf_counter_ns())
+
+        def reset():
+            if starts:
+                self.span("reset", name, starts.pop())
+
+        model.modelAboutToBeReset.connect(about_to_reset)
+        model.modelReset.connect(reset)
+
+    def summary(self):
+        # [(categoria, nom, vegades, total ms, mitjana ms, màxim ms)]
+        with self.lock:
+            items = list(self.stats.items())
+        return sorted(
+            ((category, name, count, total / 1e6, total / count / 1e6,
+              longest / 1e6)
+             for (category, name), (count, total, longest) in items),
+            key=lambda row: row[3], reverse=True)
+
+    def save(self, path):
+        with self.lock:
+            events = list(self.events)
+        for tid, name in self.threads.items():
+            events.append({"name": "thread_name", "ph": "M",
+                           "pid": os.getpid(), "tid": tid,
+                           "args": {"name": name}})
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+sql_names = {}
+
+
+def sql_name(sql):
+    # Primera part de la sentència, sense salts de línia
+    name = sql_names.get(sql)
+    if name is None:
+        name = sql_names[sql] = " ".join(sql.split())[:80]
+    return name
+
+
+recorder = Recorder()
+trace_path = os.environ.get("TASQUES_TRACE", "")
+if trace_path:
+    recorder.enable()
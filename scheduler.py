@@ -0,0 +1,183 @@
+import heapq
+import itertools
+
+from PySide6.QtCore import (
+    Qt, Slot, QDate, QDateTime, QObject, QTime, QTimer, Signal)
+
+# Avisos de terminis sense recórrer la taula. Es carreguen d'una vegada les
+# tasques no fetes dels pròxims WINDOW_DAYS dies amb l'índex parcial de
+# terminis, els seus avisos van a un munt ordenat per data i un sol QTimer
+# espera fins al primer. Els canvis de la interfície actualitzen el munt.
+
+
+def iso(date):
+    return date.toString(Qt.ISODate)
+
+
+class DeadlineScheduler(QObject):
+    DUE_SOON_DAYS = 1
+    WINDOW_DAYS = 7
+    # Tipus d'avís, en l'ordre en què es mostren el mateix dia
+    OVERDUE = 0
+    DUE_SOON = 1
+    RELOAD = 2
+    # Descripcions que s'anomenen en cada avís
+    NAMED = 3
+
+    notified = Signal(str)
+
+    def __init__(self, data, parent=None):
+        super().__init__(parent)
+        self.db = data
+        # (data de l'avís, tipus, ordre, task_id, termini)
+        self.heap = []
+        self.sequence = itertools.count()
+        # task_id -> (module_id, descripció, termini) de les tasques no fetes
+        # de la finestra. Un avís del munt només val si el termini coincideix.
+        self.tasks = {}
+        # Els avisos fins a aquesta data ja s'han mostrat
+        self.shown_until = iso(QDate.currentDate().addDays(-1))
+        self.window_end = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+        self.db.opened.connect(self.load)
+        self.db.task_inserted.connect(self.on_task_inserted)
+        self.db.task_updated.connect(self.on_task_updated)
+        self.db.tasks_updated.connect(self.on_tasks_updated)
+        self.db.tasks_deleted.connect(self.on_tasks_deleted)
+        self.db.tasks_changed.connect(self.load)
+        self.db.module_removed.connect(self.on_module_removed)
+
+    @Slot()
+    def load(self):
+        # Termini d'ahir (endarrerides des d'avui) fins al dels "vencen
+        # aviat" de l'últim dia de la finestra
+        today = QDate.currentDate()
+        end = today.addDays(self.WINDOW_DAYS)
+        self.db.call("pending_deadlines", iso(today.addDays(-1)),
+                     iso(end.addDays(self.DUE_SOON_DAYS)),
+                     done=lambda rows: self.on_loaded(iso(end), rows))
+
+    def on_loaded(self, window_end, rows):
+        self.window_end = window_end
+        self.heap = []
+        self.tasks = {}
+        for row in rows:
+            self._add(*row)
+        next_day = QDate.fromString(window_end, Qt.ISODate).addDays(1)
+        self._push(iso(next_day), self.RELOAD, None, None)
+        self._arm()
+
+    def _add(self, task_id, module_id, description, deadline):
+        self.tasks[task_id] = (module_id, description, deadline)
+        date = QDate.fromString(deadline, Qt.ISODate)
+        self._push(iso(date.addDays(-self.DUE_SOON_DAYS)), self.DUE_SOON,
+                   task_id, deadline)
+        self._push(iso(date.addDays(1)), self.OVERDUE, task_id, deadline)
+
+    def _push(self, date, kind, task_id, deadline):
+        if date <= self.shown_until or \
+                kind != self.RELOAD and date > self.window_end:
+            return
+        heapq.heappush(self.heap,
+                       (date, kind, next(self.sequence), task_id, deadline))
+
+    def _valid(self, entry):
+        _, kind, _, task_id, deadline = entry
+        if kind == self.RELOAD:
+            return True
+        task = self.tasks.get(task_id)
+        return task is not None and task[2] == deadline
+
+    def _arm(self):
+        # Els avisos de tasques fetes, esborrades o amb un altre termini es
+        # descarten en arribar al cap del munt
+        while self.heap and not self._valid(self.heap[0]):
+            heapq.heappop(self.heap)
+        if not self.heap:
+            self.timer.stop()
+            return
+        when = QDateTime(QDate.fromString(self.heap[0][0], Qt.ISODate),
+                         QTime(0, 0))
+        self.timer.start(max(0, QDateTime.currentDateTime().msecsTo(when)))
+
+    @Slot()
+    def on_timeout(self):
+        today = iso(QDate.currentDate())
+        names = {self.OVERDUE: [], self.DUE_SOON: []}
+        reload = False
+        while self.heap and self.heap[0][0] <= today:
+            entry = heapq.heappop(self.heap)
+            if not self._valid(entry):
+                continue
+            _, kind, _, task_id, _ = entry
+            if kind == self.RELOAD:
+                reload = True
+                continue
+            names[kind].append(self.tasks[task_id][1])
+            if kind == self.OVERDUE:
+                # No queda cap altre avís per a aquesta tasca
+                del self.tasks[task_id]
+        self.shown_until = today
+        for kind, title in ((self.OVERDUE, "Tasques endarrerides"),
+                            (self.DUE_SOON, "Tasques que vencen aviat")):
+            if names[kind]:
+                self.notified.emit(self._message(title, names[kind]))
+        if reload:
+            self.load()
+        else:
+            self._arm()
+
+    def _message(self, title, names):
+        text = ", ".join(names[:self.NAMED])
+        if len(names) > self.NAMED:
+            text += f" i {len(names) - self.NAMED} més"
+        return f"{title}: {text}"
+
+    def _track(self, rows):
+        # Tasques que entren a la finestra o hi tornen a estar pendents
+        if self.window_end is None:
+            return
+        for row in rows:
+            self._add(*row)
+        self._arm()
+
+    @Slot(int, int, object)
+    def on_task_inserted(self, module_id, position, row):
+        task_id, module_id, description, deadline, finished = row
+        if not finished:
+            self._track([(task_id, module_id, description, deadline)])
+
+    @Slot(int, int, int, object)
+    def on_task_updated(self, module_id, task_id, column, value):
+        self.on_tasks_updated(module_id, [task_id], column, value)
+
+    @Slot(int, object, int, object)
+    def on_tasks_updated(self, module_id, task_ids, column, value):
+        if column == 2:
+            for task_id in task_ids:
+                task = self.tasks.get(task_id)
+                if task is not None:
+                    self.tasks[task_id] = (task[0], value, task[2])
+        elif column == 4 and value:
+            for task_id in task_ids:
+                self.tasks.pop(task_id, None)
+            self._arm()
+        elif column in (3, 4):
+            # Termini nou o tasca desfeta: la descripció i el termini es
+            # llegeixen de la base de dades
+            self.db.call("pending_tasks", task_ids, done=self._track)
+
+    @Slot(object)
+    def on_tasks_deleted(self, task_ids):
+        for task_id in task_ids:
+            self.tasks.pop(task_id, None)
+        self._arm()
+
+    @Slot(int)
+    def on_module_removed(self, module_id):
+        for task_id, task in list(self.tasks.items()):
+            if task[0] == module_id:
+                del self.tasks[task_id]
+        self._arm()
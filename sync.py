@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import signal
+import sys
+import traceback
+
+from PySide6.QtCore import QCoreApplication, QObject, QTimer, Slot
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from core import Data, DataError
+
+# Servei opcional per compartir una base de dades entre diverses finestres.
+# Un sol procés (python sync.py) obri data.sqlite i atén per un socket
+# local les crides de cada client (TASQUES_SERVER=tasques python app3.py).
+# Els avisos de Data (fila inserida, cel·la canviada, comptadors...) van a
+# tots els clients, que els apliquen als models igual que els del seu fil
+# de dades. Una línia JSON per missatge:
+#   client -> servei  {"id": 1, "method": "task_page", "args": [...]}
+#   servei -> client  {"id": 1, "result": ...} o {"id": 1, "error": "..."}
+#                     {"event": "task_updated", "args": [...]}
+
+DEFAULT_NAME = "tasques"
+
+# Avisos de Data que es reenvien tal qual; counters_changed va a part amb
+# els valors perquè els clients no hagen de preguntar-los
+EVENTS = [
+    "tasks_changed", "task_inserted", "tasks_removed", "tasks_deleted",
+    "task_updated", "tasks_updated", "module_added", "module_removed",
+    "pending_changed", "flush_failed",
+]
+
+
+def server_name():
+    return os.environ.get("TASQUES_SERVER") or DEFAULT_NAME
+
+
+def pack(value):
+    # JSON només té claus de text: els diccionaris van com a parells
+    if isinstance(value, dict):
+        return {"__items__": [[pack(key), pack(item)]
+                              for key, item in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [pack(item) if isinstance(item, (dict, list, tuple)) else item
+                for item in value]
+    return value
+
+
+def unpack(obj):
+    if "__items__" in obj:
+        return {tuple(key) if isinstance(key, list) else key: item
+                for key, item in obj["__items__"]}
+    return obj
+
+
+def send(socket, message):
+    socket.write(json.dumps(pack(message), ensure_ascii=False,
+                            separators=(",", ":")).encode() + b"\n")
+
+
+def receive(socket):
+    while socket.canReadLine():
+        yield json.loads(socket.readLine().data(), object_hook=unpack)
+
+
+# Els mètodes de Data que fan servir AsyncData, commands.py i el
+# planificador. query(), iter_tasks() o empty_trash() no hi són: SQL lliure,
+# resultats que no van en JSON o la paperera de tots els clients.
+REMOTE_METHODS = {
+    "add_module", "add_task", "all_counters", "count_tasks", "export_tasks",
+    "flush", "import_tasks", "modules", "pending_deadlines", "pending_tasks",
+    "purge_trash", "queue_update", "rename_module", "restore", "search",
+    "set_finished", "task_descriptions", "task_ids", "task_page",
+    "task_position", "task_positions", "trash_module", "trash_tasks",
+}
+
+
+class SyncServer(QObject):
+    def __init__(self, data, parent=None):
+        super().__init__(parent)
+        self.db = data
+        self.clients = []
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.on_new_connection)
+        for event in EVENTS:
+            getattr(data, event).connect(
+                lambda *args, event=event: self.broadcast(event, *args))
+        data.counters_changed.connect(self.on_counters_changed)
+
+    def listen(self, name):
+        # Un socket que ha quedat d'un servei mort s'esborra; si el servei
+        # encara respon, no se'n pot obrir un altre amb el mateix nom
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(1000):
+            probe.disconnectFromServer()
+            raise DataError(f"Ja hi ha un servei a «{name}»")
+        QLocalServer.removeServer(name)
+        if not self.server.listen(name):
+            raise DataError(self.server.errorString())
+
+    def broadcast(self, event, *args):
+        message = {"event": event, "args": args}
+        for socket in self.clients:
+            send(socket, message)
+
+    @Slot(int)
+    def on_counters_changed(self, module_id):
+        self.broadcast("counters_updated", module_id,
+                       tuple(self.db.module_counters(module_id)))
+
+    @Slot()
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            self.clients.append(socket)
+            socket.readyRead.connect(
+                lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(
+                lambda socket=socket: self.clients.remove(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def on_ready_read(self, socket):
+        # Les crides s'atenen en ordre; els avisos que provoquen arriben a
+        # tots els clients abans que la resposta
+        for request in receive(socket):
+            request_id, method = request["id"], request["method"]
+            if method not in REMOTE_METHODS:
+                send(socket, {"id": request_id,
+                              "error": f"Crida desconeguda: {method}"})
+                continue
+            try:
+                result = self.db.retry(getattr(self.db, method),
+                                       *request["args"])
+                # Dins del try: un resultat que no va en JSON també ha de
+                # tornar resposta
+                send(socket, {"id": request_id, "result": result})
+            except DataError as error:
+                send(socket, {"id": request_id, "error": str(error)})
+            except Exception as error:
+                # El client espera la resposta igualment
+                traceback.print_exc()
+                send(socket, {"id": request_id,
+                              "error": f"Error inesperat en {method}: "
+                                       f"{error}"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Servei per compartir una base de dades de tasques")
+    parser.add_argument("--db", help="fitxer SQLite (per defecte data.sqlite)")
+    parser.add_argument("--name", default=server_name(),
+                        help="nom del socket local (per defecte "
+                             "TASQUES_SERVER o «tasques»)")
+    args = parser.parse_args(argv)
+    app = QCoreApplication(sys.argv[:1])
+    try:
+        data = Data(args.db)
+        # Els lots de la paperera són de les piles de desfer dels clients;
+        # cap sobreviu a un reinici del servei
+        data.retry(data.empty_trash)
+        server = SyncServer(data)
+        server.listen(args.name)
+    except DataError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    # Ctrl+C: el bucle de Qt ha de tornar a Python de tant en tant perquè
+    # s'executen els gestors de senyals
+    signal.signal(signal.SIGINT, lambda *args: app.quit())
+    signal.signal(signal.SIGTERM, lambda *args: app.quit())
+    timer = QTimer()
+    timer.timeout.connect(lambda: None)
+    timer.start(200)
+    print(f"Servei escoltant a {server.server.fullServerName()}")
+    app.exec()
+    try:
+        data.retry(data.flush)
+    except DataError as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
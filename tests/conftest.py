@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Els mòduls de l'aplicació són a l'arrel del repositori, sense paquet
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import QCoreApplication  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    # QSqlDatabase necessita una aplicació, però no cal cap pantalla
+    return QCoreApplication.instance() or QCoreApplication([])
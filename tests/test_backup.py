@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+from core import Data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# backup.py: la base recuperada ha de ser igual que l'original. backup.py
+# va en un altre procés: dos SQLite en un procés no veuen els bloquejos.
+
+def run_backup(*args):
+    subprocess.run([sys.executable, os.path.join(ROOT, "backup.py"), *args],
+                   check=True, capture_output=True)
+
+
+def contents(data):
+    tables = {}
+    for table, columns in (("module", "id, name"),
+                           ("task", "id, module_id, description, deadline, "
+                                    "finished")):
+        query = data.query(f"SELECT {columns} FROM {table} ORDER BY id")
+        rows = []
+        while query.next():
+            rows.append(tuple(query.value(column)
+                              for column in range(query.record().count())))
+        tables[table] = rows
+    return tables
+
+
+def test_backup_and_restore_round_trip(app, tmp_path):
+    source_path = str(tmp_path / "data.sqlite")
+    backups = str(tmp_path / "còpies")
+    source = Data(source_path, "backup-source")
+    module_id = source.add_module("Còpies")
+    task_ids = [source.add_task(module_id, f"Tasca {number}", "2026-03-01")
+                for number in range(10)]
+    source.flush()
+    run_backup("--db", source_path, "backup", backups)
+
+    # Canvis després de la instantània: van als registres incrementals
+    source.add_task(module_id, "Nova", "2026-04-01")
+    source.set_finished(task_ids[:3])
+    source.trash_tasks(task_ids[5:7])
+    source.rename_module(module_id, "Còpies reanomenades")
+    other = source.add_module("Altre")
+    source.add_task(other, "De l'altre", "2026-05-01")
+    source.trash_module(other)
+    source.flush()
+    run_backup("--db", source_path, "backup", backups)
+    expected = contents(source)
+    source.connection.close()
+
+    target_path = str(tmp_path / "recuperada.sqlite")
+    run_backup("restore", backups, target_path)
+    target = Data(target_path, "backup-target")
+    assert contents(target) == expected
+    target.connection.close()
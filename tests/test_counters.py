@@ -0,0 +1,87 @@
+import pytest
+
+from core import Data
+
+
+# Els comptadors per mòdul (total, fetes, endarrerides) es porten a mà a
+# cada canvi; després de cada pas han de coincidir amb un recompte en SQL
+
+PAST = "2000-01-01"
+FUTURE = "2999-01-01"
+
+
+@pytest.fixture
+def data(app, tmp_path, request):
+    data = Data(str(tmp_path / "data.sqlite"), request.node.name)
+    yield data
+    data.connection.close()
+
+
+def recount(data, module_id):
+    data.flush()
+    query = data.query(
+        """
+        SELECT count(*), coalesce(sum(finished), 0),
+               coalesce(sum(finished = 0 AND deadline < ?), 0)
+        FROM task WHERE module_id = ?
+        """, (data.counters_day, module_id))
+    query.next()
+    return [query.value(0), query.value(1), query.value(2)]
+
+
+def check(data, *module_ids):
+    for module_id in module_ids:
+        assert list(data.module_counters(module_id)) == \
+            recount(data, module_id)
+
+
+def test_queued_edits_keep_the_counters(data):
+    module_id = data.add_module("Comptadors")
+    late = data.add_task(module_id, "Endarrerida", PAST)
+    soon = data.add_task(module_id, "Pendent", FUTURE)
+    # Primera lectura: a partir d'aquí es porten a mà
+    check(data, module_id)
+
+    data.queue_update(module_id, late, "finished", 1)
+    check(data, module_id)
+    data.queue_update(module_id, soon, "deadline", PAST)
+    data.queue_update(module_id, late, "finished", 0)
+    # Diverses edicions de la mateixa tasca abans d'escriure-les
+    data.queue_update(module_id, late, "deadline", FUTURE)
+    data.queue_update(module_id, late, "deadline", PAST)
+    data.queue_update(module_id, soon, "description", "Sense efecte")
+    assert data.pending
+    check(data, module_id)
+    assert not data.pending
+
+
+def test_bulk_changes_keep_the_counters(data):
+    module_id = data.add_module("Comptadors")
+    other = data.add_module("Altre")
+    task_ids = [data.add_task(module_id, f"Tasca {number}",
+                              PAST if number % 2 else FUTURE)
+                for number in range(6)]
+    other_id = data.add_task(other, "De l'altre", PAST)
+    check(data, module_id, other)
+
+    # Ja feta, pendent i d'un altre mòdul en la mateixa crida
+    data.set_finished(task_ids[:2])
+    data.set_finished(task_ids[1:4] + [other_id])
+    check(data, module_id, other)
+    data.set_finished(task_ids[2:3] + [other_id], 0)
+    check(data, module_id, other)
+
+    # Una edició pendent abans de marcar: la marca la inclou
+    data.queue_update(module_id, task_ids[4], "deadline", PAST)
+    data.set_finished(task_ids[4:])
+    check(data, module_id, other)
+
+    batch = data.trash_tasks(task_ids[::2])
+    check(data, module_id, other)
+    data.restore(batch)
+    check(data, module_id, other)
+
+    batch = data.trash_module(other)
+    check(data, module_id)
+    data.restore(batch)
+    check(data, module_id, other)
@@ -0,0 +1,47 @@
+import io
+import json
+
+import pytest
+
+from core import read_json_array
+
+
+# read_json_array: els objectes poden quedar partits entre lectures
+
+ITEMS = [
+    {"module": "DI", "description": "Fa [1, 2], \"cometes\" i {claus}",
+     "deadline": "2026-01-01", "finished": True},
+    {"module": "AD", "description": "", "deadline": "01/02/2026",
+     "finished": 0},
+    {"module": "PSP", "description": "Ç à ü — ∑", "deadline": None},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64, 65536])
+@pytest.mark.parametrize("text", [
+    json.dumps(ITEMS),
+    json.dumps(ITEMS, indent=4),
+    "  \n\t" + json.dumps(ITEMS, separators=(",", ":")) + "\n",
+])
+def test_read_json_array_chunks(text, chunk_size):
+    items = list(read_json_array(io.StringIO(text), chunk_size))
+    assert items == ITEMS
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 65536])
+def test_read_json_array_numbers_across_chunks(chunk_size):
+    # Un número pot continuar en la lectura següent
+    text = "[12345, 6.75e2, -98765]"
+    assert list(read_json_array(io.StringIO(text), chunk_size)) == \
+        [12345, 675.0, -98765]
+
+
+@pytest.mark.parametrize("text", ["[]", " [ ] ", "[\n]\n"])
+def test_read_json_array_empty(text):
+    assert list(read_json_array(io.StringIO(text), 1)) == []
+
+
+@pytest.mark.parametrize("text", ["", "{}", '{"module": "DI"}', "[{}, {"])
+def test_read_json_array_invalid(text):
+    with pytest.raises(ValueError):
+        list(read_json_array(io.StringIO(text), 2))
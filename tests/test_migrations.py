@@ -0,0 +1,99 @@
+import os
+import shutil
+
+import pytest
+
+from core import Data, DataError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Migracions sobre una base de dades que ja existia: la del repositori, amb
+# les taules de l'aplicació original i user_version 0
+
+def rows(data, sql, values=()):
+    query = data.query(sql, values)
+    result = []
+    while query.next():
+        result.append(tuple(query.value(column)
+                            for column in range(query.record().count())))
+    return result
+
+
+@pytest.fixture
+def shipped(tmp_path):
+    path = str(tmp_path / "data.sqlite")
+    shutil.copy(os.path.join(ROOT, "data.sqlite"), path)
+    return path
+
+
+def test_existing_database_is_migrated_once(app, shipped):
+    data = Data(shipped, "migrations-first")
+    assert data.schema_version() == len(Data.MIGRATIONS)
+    tasks = rows(data, "SELECT id, module_id, description, finished FROM task "
+                       "ORDER BY id")
+    modules = rows(data, "SELECT id, name FROM module ORDER BY id")
+    # Les dades d'exemple només van a una base de dades nova
+    assert len(tasks) == 8
+    assert rows(data, "SELECT name FROM sqlite_master WHERE type = 'index' "
+                      "AND name = 'task_module_finished_deadline'")
+    data.connection.close()
+
+    data = Data(shipped, "migrations-again")
+    assert data.schema_version() == len(Data.MIGRATIONS)
+    assert rows(data, "SELECT id, module_id, description, finished FROM task "
+                      "ORDER BY id") == tasks
+    assert rows(data, "SELECT id, name FROM module ORDER BY id") == modules
+    data.connection.close()
+
+
+def test_failed_migration_keeps_the_previous_version(app, shipped,
+                                                     monkeypatch):
+    def broken(self, query):
+        query.exec("CREATE TABLE broken (value INTEGER)")
+        return False
+
+    monkeypatch.setattr(Data, "MIGRATIONS", Data.MIGRATIONS + ["broken"])
+    monkeypatch.setattr(Data, "broken", broken, raising=False)
+    with pytest.raises(DataError):
+        Data(shipped, "migrations-broken")
+    monkeypatch.undo()
+
+    data = Data(shipped, "migrations-after-broken")
+    assert data.schema_version() == len(Data.MIGRATIONS)
+    assert not rows(data, "SELECT name FROM sqlite_master "
+                          "WHERE name = 'broken'")
+    data.connection.close()
+
+
+def test_deadlines_become_iso_dates(app, shipped):
+    data = Data(shipped, "migrations-iso")
+    deadlines = dict(rows(data, "SELECT id, deadline FROM task"))
+    # 20/01/2023 a la base de dades original
+    assert deadlines[0] == "2023-01-20"
+    assert all(len(deadline) == 10 and deadline[4] == "-" and
+               deadline[7] == "-" for deadline in deadlines.values())
+    # L'ordre per data ja és l'ordre del text
+    ordered = [row[0] for row in rows(
+        data, "SELECT deadline FROM task ORDER BY deadline, id")]
+    assert ordered == sorted(deadlines.values())
+    data.connection.close()
+
+
+def test_iso_migration_leaves_other_values(app, tmp_path):
+    # Un valor que no és dd/MM/yyyy no es toca: millor que inventar una data
+    path = str(tmp_path / "data.sqlite")
+    data = Data(path, "migrations-iso-new")
+    data.query("INSERT INTO task (module_id, description, deadline, "
+               "finished) VALUES (1, 'Rara', 'demà', 0)")
+    data.query("INSERT INTO task (module_id, description, deadline, "
+               "finished) VALUES (1, 'Vella', '05/03/2024', 0)")
+    # De tornada a abans de la migració de les dates
+    data.query("PRAGMA user_version = 2")
+    data.connection.close()
+
+    data = Data(path, "migrations-iso-reopen")
+    assert dict(rows(data, "SELECT description, deadline FROM task "
+                           "WHERE description IN ('Rara', 'Vella')")) == \
+        {"Rara": "demà", "Vella": "2024-03-05"}
+    data.connection.close()
@@ -0,0 +1,101 @@
+import os
+import time
+import uuid
+
+import pytest
+
+from core import Data
+from sync import SyncServer
+from worker import AsyncData
+
+
+# sync.py: el servei i dos clients en el mateix procés, com dues finestres
+# a la mateixa màquina. Cada client té el seu fil i el seu socket.
+
+def wait(app, condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "el servei no ha respost a temps"
+        app.processEvents()
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def server(app, tmp_path):
+    data = Data(str(tmp_path / "data.sqlite"), "sync-server")
+    service = SyncServer(data)
+    # Un nom per prova: no pot topar amb un servei real ni amb una altra
+    name = f"tasques-test-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    service.listen(name)
+    yield name
+    service.server.close()
+    data.connection.close()
+
+
+@pytest.fixture
+def clients(app, server):
+    clients = [AsyncData(server=server) for _ in range(2)]
+    opened = []
+    for client in clients:
+        client.opened.connect(lambda: opened.append(True))
+        client.open_failed.connect(pytest.fail)
+        client.start()
+    wait(app, lambda: len(opened) == len(clients))
+    yield clients
+    # Sense close(): esperaria la resposta del servei, que és en aquest fil
+    for client in clients:
+        client.thread.quit()
+        client.thread.wait()
+
+
+def call(app, client, method, *args):
+    results = []
+    client.call(method, *args, done=results.append, failed=pytest.fail)
+    wait(app, lambda: results)
+    return results[0]
+
+
+def test_insert_reaches_the_other_client(app, clients):
+    first, second = clients
+    inserted = []
+    second.task_inserted.connect(
+        lambda *args: inserted.append(args))
+    task_id = call(app, first, "add_task", 1, "Des del primer", "2026-03-01")
+    wait(app, lambda: inserted)
+    module_id, position, row = inserted[0]
+    assert module_id == 1
+    assert row[0] == task_id
+    assert position == call(app, second, "task_position", 1, task_id)
+
+
+def test_update_reaches_the_other_client(app, clients):
+    first, second = clients
+    updated = []
+    second.tasks_updated.connect(lambda *args: updated.append(args))
+    task_id = call(app, first, "add_task", 1, "Per marcar", "2026-03-01")
+    call(app, first, "set_finished", [task_id], 1)
+    wait(app, lambda: updated)
+    module_id, task_ids, _, value = updated[0]
+    assert (module_id, list(task_ids), value) == (1, [task_id], 1)
+
+
+def test_imported_modules_reach_the_other_client(app, clients, tmp_path):
+    first, second = clients
+    added = []
+    second.module_added.connect(lambda *args: added.append(args))
+    path = tmp_path / "tasques.csv"
+    path.write_text("module,description,deadline,finished\n"
+                    "Importat,Tasca,2026-03-01,0\n", encoding="utf-8")
+    assert call(app, first, "import_tasks", str(path)) == 1
+    wait(app, lambda: added)
+    module_id, name = added[0]
+    assert name == "Importat"
+    assert (module_id, name) in [tuple(module) for module in
+                                 call(app, second, "modules")]
+
+
+def test_unknown_methods_are_refused(app, clients):
+    errors = []
+    clients[0].call("query", "DELETE FROM task", failed=errors.append)
+    wait(app, lambda: errors)
+    assert "query" in errors[0]
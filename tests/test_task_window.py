@@ -0,0 +1,102 @@
+import itertools
+import random
+
+import pytest
+
+from app3 import TaskWindow, task_row
+
+PAGE_SIZE = 4
+
+
+# TaskWindow: les pàgines en memòria han de coincidir sempre amb la llista
+# sencera després de desplaçar-les
+
+def make_row(task_id):
+    return task_row(task_id, 1, f"Tasca {task_id}", "2026-01-01", 0)
+
+
+def load(window, rows, number):
+    # Com TaskModel.on_page(): la pàgina i la clau d'inici de la següent
+    page = rows[number * PAGE_SIZE:(number + 1) * PAGE_SIZE]
+    window.pages[number] = list(page)
+    if len(page) == PAGE_SIZE:
+        window.anchors[number + 1] = window.key_of(page[-1])
+
+
+def check(window, rows):
+    assert window.total == len(rows)
+    for number, page in window.pages.items():
+        assert page == rows[number * PAGE_SIZE:(number + 1) * PAGE_SIZE]
+    for number, anchor in window.anchors.items():
+        if number:
+            assert anchor == window.key_of(rows[number * PAGE_SIZE - 1])
+
+
+def new_window(rows, pages):
+    window = TaskWindow(total=len(rows))
+    window.counted = True
+    for number in pages:
+        load(window, rows, number)
+    return window
+
+
+@pytest.mark.parametrize("position", [0, 1, 3, 4, 7, 8, 15, 16])
+def test_insert_shifts_loaded_pages(position):
+    rows = [make_row(task_id) for task_id in range(16)]
+    window = new_window(rows, [0, 1, 2, 3])
+    row = make_row(100)
+    rows.insert(position, row)
+    window.insert(position, row, PAGE_SIZE)
+    check(window, rows)
+
+
+@pytest.mark.parametrize("position", [0, 1, 3, 4, 7, 8, 15])
+def test_remove_shifts_loaded_pages(position):
+    rows = [make_row(task_id) for task_id in range(16)]
+    window = new_window(rows, [0, 1, 2, 3])
+    del rows[position]
+    window.remove(position, PAGE_SIZE)
+    check(window, rows)
+
+
+def test_insert_drops_page_after_a_gap():
+    # La pàgina 2 no sap quina fila li entra pel principi si l'1 no hi és
+    rows = [make_row(task_id) for task_id in range(16)]
+    window = new_window(rows, [0, 2, 3])
+    row = make_row(100)
+    rows.insert(1, row)
+    window.insert(1, row, PAGE_SIZE)
+    assert 2 not in window.pages and 3 not in window.pages
+    check(window, rows)
+
+
+def test_remove_drops_page_without_its_successor():
+    rows = [make_row(task_id) for task_id in range(16)]
+    window = new_window(rows, [0, 1, 3])
+    del rows[2]
+    window.remove(2, PAGE_SIZE)
+    assert 1 not in window.pages
+    check(window, rows)
+
+
+def test_random_inserts_and_removes():
+    generator = random.Random(20)
+    ids = itertools.count(1000)
+    rows = [make_row(task_id) for task_id in range(30)]
+    window = new_window(rows, range(8))
+    for _ in range(500):
+        if rows and generator.random() < 0.5:
+            position = generator.randrange(len(rows))
+            del rows[position]
+            window.remove(position, PAGE_SIZE)
+        else:
+            position = generator.randrange(len(rows) + 1)
+            row = make_row(next(ids))
+            rows.insert(position, row)
+            window.insert(position, row, PAGE_SIZE)
+        check(window, rows)
+        # De tant en tant la vista torna a llegir una pàgina
+        if generator.random() < 0.3 and rows:
+            number = generator.randrange((len(rows) - 1) // PAGE_SIZE + 1)
+            if number == 0 or number in window.anchors:
+                load(window, rows, number)
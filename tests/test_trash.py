@@ -0,0 +1,73 @@
+import pytest
+
+from core import Data, DataError
+
+
+# Paperera: esborrar i desfer ha de tornar les mateixes files amb els
+# mateixos ids, perquè les ordres de desfer i els altres clients els guarden
+
+@pytest.fixture
+def data(app, tmp_path, request):
+    data = Data(str(tmp_path / "data.sqlite"), request.node.name)
+    yield data
+    data.connection.close()
+
+
+def rows(data, sql, values=()):
+    query = data.query(sql, values)
+    result = []
+    while query.next():
+        result.append(tuple(query.value(column)
+                            for column in range(query.record().count())))
+    return result
+
+
+def snapshot(data, module_id):
+    return (rows(data, "SELECT id, name FROM module WHERE id = ?",
+                 (module_id,)),
+            rows(data, "SELECT id, module_id, description, deadline, finished "
+                       "FROM task WHERE module_id = ? ORDER BY id",
+                 (module_id,)))
+
+
+def test_restored_module_keeps_its_ids(data):
+    module_id = data.add_module("Per esborrar")
+    for number in range(3):
+        data.add_task(module_id, f"Tasca {number}", f"2026-03-0{number + 1}")
+    data.set_finished([rows(data, "SELECT max(id) FROM task")[0][0]])
+    before = snapshot(data, module_id)
+
+    batch = data.trash_module(module_id)
+    assert snapshot(data, module_id) == ([], [])
+    # Un mòdul nou no pot reaprofitar l'id mentre el lot es pot desfer
+    # (AUTOINCREMENT): el restore toparia amb ell
+    assert data.add_module("Nou") != module_id
+
+    added = []
+    data.module_added.connect(lambda *args: added.append(args))
+    assert data.restore(batch) == 3
+    assert snapshot(data, module_id) == before
+    assert added == [(module_id, "Per esborrar")]
+    assert not rows(data, "SELECT 1 FROM trash WHERE batch = ?", (batch,))
+
+
+def test_purged_batch_cannot_be_restored(data):
+    module_id = data.add_module("Per buidar")
+    data.add_task(module_id, "Tasca", "2026-03-01")
+    batch = data.trash_module(module_id)
+    data.purge_trash([batch])
+    with pytest.raises(DataError):
+        data.restore(batch)
+    assert snapshot(data, module_id) == ([], [])
+
+
+def test_restored_task_keeps_its_id(data):
+    module_id = data.add_module("Tasques")
+    data.add_task(module_id, "Primera", "2026-03-01")
+    last = data.add_task(module_id, "Última", "2026-03-02")
+    batch = data.trash_tasks([last])
+    # La nova no pot ser last: era l'id més alt de la taula
+    assert data.add_task(module_id, "Nova", "2026-03-03") > last
+    assert data.restore(batch) == 1
+    assert rows(data, "SELECT description FROM task WHERE id = ?",
+                (last,)) == [("Última",)]
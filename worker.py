@@ -0,0 +1,326 @@
+import itertools
+import time
+import traceback
+
+from PySide6.QtCore import Qt, Slot, QDate, QObject, QThread, Signal
+from PySide6.QtNetwork import QLocalSocket
+
+from core import Data, DataError
+from instrument import recorder
+from sync import receive, send
+
+
+class Worker(QObject):
+    # Senyals comuns dels treballadors que AsyncData mou al fil de dades.
+    # Els slots van en cada subclasse: PySide no registra els que en
+    # sobreescriuen un de la classe base.
+    opened = Signal()
+    open_failed = Signal(str)
+    finished = Signal(int, object)
+    failed = Signal(int, str)
+    # Els mateixos avisos que Data, reemesos des d'aquest fil
+    tasks_changed = Signal(int)
+    task_inserted = Signal(int, int, object)
+    tasks_removed = Signal(int, object)
+    tasks_deleted = Signal(object)
+    task_updated = Signal(int, int, int, object)
+    tasks_updated = Signal(int, object, int, object)
+    module_added = Signal(int, str)
+    module_removed = Signal(int)
+    counters_updated = Signal(int, object)
+    pending_changed = Signal(int)
+    flush_failed = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.close_error = None
+
+
+class DataWorker(Worker):
+    # Viu en el fil de dades amb la seua pròpia connexió i atén les
+    # peticions en l'ordre en què arriben
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = path
+        self.data = None
+
+    @Slot()
+    def open(self):
+        # Les migracions i la primera càrrega ja no bloquegen la finestra
+        recorder.name_thread("dades")
+        try:
+            self.data = Data(self.path, "worker")
+        except DataError as error:
+            self.open_failed.emit(str(error))
+            return
+        self.data.tasks_changed.connect(self.tasks_changed)
+        self.data.task_inserted.connect(self.task_inserted)
+        self.data.tasks_removed.connect(self.tasks_removed)
+        self.data.tasks_deleted.connect(self.tasks_deleted)
+        self.data.task_updated.connect(self.task_updated)
+        self.data.tasks_updated.connect(self.tasks_updated)
+        self.data.module_added.connect(self.module_added)
+        self.data.module_removed.connect(self.module_removed)
+        self.data.counters_changed.connect(self.on_counters_changed)
+        self.data.pending_changed.connect(self.pending_changed)
+        self.data.flush_failed.connect(self.flush_failed)
+        self.opened.emit()
+
+    @Slot(int, str, object)
+    def run(self, request_id, method, args):
+        start = time.perf_counter_ns() if recorder.enabled else 0
+        try:
+            result = self.data.retry(getattr(self.data, method), *args)
+        except DataError as error:
+            self.failed.emit(request_id, str(error))
+        except Exception as error:
+            # Un error de programació també ha de tornar resposta; si no,
+            # qui espera la crida (i l'estat "carregant") no acaba mai
+            traceback.print_exc()
+            self.failed.emit(request_id, f"Error inesperat en {method}: "
+                                         f"{error}")
+        else:
+            self.finished.emit(request_id, result)
+        if start:
+            recorder.span("worker", method, start)
+
+    @Slot(int)
+    def on_counters_changed(self, module_id):
+        self.counters_updated.emit(
+            module_id, tuple(self.data.module_counters(module_id)))
+
+    @Slot(bool)
+    def close(self, flush):
+        self.close_error = None
+        if self.data is None:
+            return
+        if not flush:
+            self.data.discard()
+            return
+        try:
+            self.data.retry(self.data.flush)
+        except DataError as error:
+            self.close_error = str(error)
+
+
+class RemoteWorker(Worker):
+    # El mateix paper que DataWorker, però les crides van al servei de
+    # sync.py i els avisos arriben d'allí, també els d'altres clients
+    CONNECT_TIMEOUT = 3000
+    CLOSE_TIMEOUT = 10000
+    # Identificador de la crida de close(), que no passa per AsyncData
+    CLOSE_REQUEST = 0
+    LOST = "S'ha perdut la connexió amb el servei"
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        self.socket = None
+        self.requests = set()
+        self.close_reply = None
+
+    @Slot()
+    def open(self):
+        recorder.name_thread("dades")
+        self.socket = QLocalSocket(self)
+        self.socket.connectToServer(self.name)
+        if not self.socket.waitForConnected(self.CONNECT_TIMEOUT):
+            self.open_failed.emit(
+                f"No es pot connectar amb el servei «{self.name}»: "
+                f"{self.socket.errorString()}")
+            return
+        self.socket.readyRead.connect(self.on_ready_read)
+        self.socket.disconnected.connect(self.on_disconnected)
+        self.opened.emit()
+
+    def connected(self):
+        return self.socket is not None and \
+            self.socket.state() == QLocalSocket.ConnectedState
+
+    @Slot(int, str, object)
+    def run(self, request_id, method, args):
+        if not self.connected():
+            self.failed.emit(request_id, self.LOST)
+            return
+        self.requests.add(request_id)
+        send(self.socket, {"id": request_id, "method": method, "args": args})
+
+    @Slot()
+    def on_ready_read(self):
+        for message in receive(self.socket):
+            if "event" in message:
+                getattr(self, message["event"]).emit(*message["args"])
+                continue
+            request_id = message["id"]
+            if request_id == self.CLOSE_REQUEST:
+                self.close_reply = message
+            elif "error" in message:
+                self.requests.discard(request_id)
+                self.failed.emit(request_id, message["error"])
+            else:
+                self.requests.discard(request_id)
+                self.finished.emit(request_id, message["result"])
+
+    @Slot()
+    def on_disconnected(self):
+        for request_id in sorted(self.requests):
+            self.failed.emit(request_id, self.LOST)
+        self.requests.clear()
+
+    @Slot(bool)
+    def close(self, flush):
+        # Les edicions pendents són al servei: se li demana que les escriga
+        # abans d'eixir. Sense flush es queden allí i les escriu ell.
+        self.close_error = None
+        if not self.connected():
+            return
+        if not flush:
+            self.socket.disconnectFromServer()
+            return
+        self.close_reply = None
+        send(self.socket, {"id": self.CLOSE_REQUEST, "method": "flush",
+                           "args": []})
+        while self.close_reply is None:
+            if not self.socket.waitForReadyRead(self.CLOSE_TIMEOUT):
+                self.close_error = self.LOST
+                return
+        if "error" in self.close_reply:
+            self.close_error = self.close_reply["error"]
+            return
+        self.socket.disconnectFromServer()
+
+
+class AsyncData(QObject):
+    # Façana de Data per al fil de la interfície. Les crides tornen de
+    # seguida i el resultat arriba a done() o failed() quan el fil de
+    # dades l'ha calculat.
+    opened = Signal()
+    open_failed = Signal(str)
+    request_failed = Signal(str)
+    tasks_changed = Signal(int)
+    task_inserted = Signal(int, int, object)
+    tasks_removed = Signal(int, object)
+    tasks_deleted = Signal(object)
+    task_updated = Signal(int, int, int, object)
+    tasks_updated = Signal(int, object, int, object)
+    module_added = Signal(int, str)
+    module_removed = Signal(int)
+    counters_changed = Signal(int)
+    pending_changed = Signal(int)
+    flush_failed = Signal(str)
+    # Cap al fil de dades
+    requested = Signal(int, str, object)
+    closing = Signal(bool)
+
+    def __init__(self, path=None, parent=None, server=None):
+        super().__init__(parent)
+        self.callbacks = {}
+        self.ids = itertools.count(1)
+        # Còpia dels comptadors per pintar-los sense esperar el fil
+        self.counters = {}
+        self.counters_day = None
+        self.thread = QThread(self)
+        # Amb server, les crides van al servei de sync.py amb aquest nom
+        self.server = server
+        if server is None:
+            self.worker = DataWorker(path)
+        else:
+            self.worker = RemoteWorker(server)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.open)
+        self.requested.connect(self.worker.run)
+        self.closing.connect(self.worker.close, Qt.BlockingQueuedConnection)
+        self.worker.opened.connect(self.on_opened)
+        self.worker.open_failed.connect(self.on_open_failed)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.failed.connect(self.on_failed)
+        self.worker.tasks_changed.connect(self.tasks_changed)
+        self.worker.task_inserted.connect(self.task_inserted)
+        self.worker.tasks_removed.connect(self.tasks_removed)
+        self.worker.tasks_deleted.connect(self.tasks_deleted)
+        self.worker.task_updated.connect(self.task_updated)
+        self.worker.tasks_updated.connect(self.tasks_updated)
+        self.worker.module_added.connect(self.module_added)
+        self.worker.module_removed.connect(self.on_module_removed)
+        self.worker.counters_updated.connect(self.on_counters_updated)
+        self.worker.pending_changed.connect(self.pending_changed)
+        self.worker.flush_failed.connect(self.flush_failed)
+
+    def start(self):
+        self.thread.start()
+
+    def close(self, flush=True):
+        # Espera que el fil escriga els canvis pendents; si no pot, el fil
+        # continua viu i es torna l'error. Si no ha arrencat (la finestra es
+        # tanca abans de pintar-se), ningú no atendria la crida bloquejant.
+        if not self.thread.isRunning():
+            return None
+        self.closing.emit(flush)
+        error = self.worker.close_error
+        if error is None:
+            self.thread.quit()
+            self.thread.wait()
+        return error
+
+    def call(self, method, *args, done=None, failed=None):
+        request_id = next(self.ids)
+        # El temps d'anada i tornada inclou l'espera a la cua del fil
+        start = time.perf_counter_ns() if recorder.enabled else 0
+        self.callbacks[request_id] = (done, failed, method, start)
+        self.requested.emit(request_id, method, args)
+        return request_id
+
+    def report(self, error):
+        self.request_failed.emit(error)
+
+    def module_counters(self, module_id):
+        today = QDate.currentDate().toString(Qt.ISODate)
+        if self.counters_day is not None and self.counters_day != today:
+            # Canvi de dia: cal tornar a comptar les endarrerides
+            self.counters_day = None
+            self.call("all_counters", done=self.on_counters_loaded)
+        return self.counters.get(module_id, (0, 0, 0))
+
+    @Slot()
+    def on_opened(self):
+        self.call("all_counters", done=self.on_counters_loaded)
+        self.opened.emit()
+
+    @Slot(str)
+    def on_open_failed(self, error):
+        self.thread.quit()
+        self.thread.wait()
+        self.open_failed.emit(error)
+
+    @Slot(int, object)
+    def on_finished(self, request_id, result):
+        done, _, method, start = self.callbacks.pop(request_id)
+        if start:
+            recorder.span("request", method, start)
+        if done is not None:
+            done(result)
+
+    @Slot(int, str)
+    def on_failed(self, request_id, error):
+        _, failed, method, start = self.callbacks.pop(request_id)
+        if start:
+            recorder.span("request", method, start, {"error": error})
+        if failed is not None:
+            failed(error)
+        else:
+            self.report(error)
+
+    def on_counters_loaded(self, result):
+        self.counters_day, self.counters = result
+        for module_id in self.counters:
+            self.counters_changed.emit(module_id)
+
+    @Slot(int, object)
+    def on_counters_updated(self, module_id, values):
+        self.counters[module_id] = values
+        self.counters_changed.emit(module_id)
+
+    @Slot(int)
+    def on_module_removed(self, module_id):
+        self.counters.pop(module_id, None)
+        self.module_removed.emit(module_id)